@@ -1,6 +1,8 @@
-import sqlite3
+import re
 import tiktoken
-from config import DB_FILE
+import db
+from bill_texts import decompress_text
+from chunk_cache import cache_key, cached_keys, cache_stats
 
 # Set model and prices
 MODEL = "gpt-4"
@@ -9,7 +11,9 @@ ENCODING = tiktoken.encoding_for_model(MODEL)
 COST_PER_1K_INPUT = 0.03  # USD
 COST_PER_1K_OUTPUT = 0.06  # USD
 
-MAX_CHUNK_SIZE = 1500
+# Chunks are packed up to this many tokens. gpt-4 has an 8k context, which leaves
+# room for the prompt and the ~150-token chunk summary.
+CHUNK_TOKEN_BUDGET = 3000
 CHUNK_PROMPT = "Summarize this section of a legislative bill clearly and concisely."
 FINAL_PROMPT_TEMPLATE = (
     "Combine the following section summaries into a final, plain-English summary of the bill. "
@@ -19,13 +23,114 @@ FINAL_PROMPT_TEMPLATE = (
 def count_tokens(text):
     return len(ENCODING.encode(text))
 
-def estimate_tokens_and_cost_for_text(text):
-    chunks = [text[i:i + MAX_CHUNK_SIZE] for i in range(0, len(text), MAX_CHUNK_SIZE)]
+# ----------------------------
+# ✂️ Token-aware bill chunking
+# ----------------------------
+# A new section starts at lines like "SEC. 4.", "Section 12.", "SECTION 3" or "Sec. 101."
+SECTION_HEADER = re.compile(r"^\s*(?:SEC(?:TION)?\.?|Sec(?:tion)?\.?)\s+\d", re.MULTILINE)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.;:])\s+")
+
+def split_sections(text):
+    """Split bill text before each section header; text ahead of the first header is its own piece."""
+    starts = [m.start() for m in SECTION_HEADER.finditer(text)]
+    bounds = [0] + [s for s in starts if s > 0] + [len(text)]
+    return [text[a:b].strip() for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+def split_on(pattern, text):
+    """Split text at each match of pattern. Returns [(separator, part), ...], where separator is the text
+    that came before the part (empty for the first one), so "".join(separator + part) gives text back."""
+    parts, separator, start = [], "", 0
+    for match in pattern.finditer(text):
+        part = text[start:match.start()]
+        if part.strip():
+            parts.append((separator, part))
+            separator = ""
+        else:
+            separator += part
+        separator += match.group()
+        start = match.end()
+    if text[start:].strip():
+        parts.append((separator, text[start:]))
+    return parts
+
+def split_to_budget(text, max_tokens):
+    """Break one piece into (text, tokens, separator) pieces of at most max_tokens, using the coarsest boundary that works.
+
+    separator is the original text between a piece and the one before it, so
+    the pieces rejoin exactly; the first piece's is None.
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return [(text, tokens, None)]
+
+    for pattern in (PARAGRAPH_BREAK, SENTENCE_BREAK):
+        parts = split_on(pattern, text)
+        if len(parts) > 1:
+            pieces = []
+            for separator, part in parts:
+                sub_pieces = split_to_budget(part, max_tokens)
+                if pieces:
+                    piece, piece_tokens, _ = sub_pieces[0]
+                    sub_pieces[0] = (piece, piece_tokens, separator)
+                pieces.extend(sub_pieces)
+            return pieces
+
+    # No usable boundary (e.g. a giant table): cut on token boundaries
+    encoded = ENCODING.encode(text)
+    return [
+        (ENCODING.decode(encoded[i:i + max_tokens]), len(encoded[i:i + max_tokens]), None if i == 0 else "")
+        for i in range(0, len(encoded), max_tokens)
+    ]
+
+SECTION_SEPARATOR = "\n\n"
+
+def chunk_bill_text(text, max_tokens=CHUNK_TOKEN_BUDGET):
+    """Pack a bill into as few chunks as fit max_tokens each, splitting on sections, then paragraphs.
+
+    Whole sections are packed together whenever they fit, joined by a blank
+    line, and a section is only broken up when it alone exceeds the budget; its
+    pieces keep the text that separated them. Returns a list of (chunk, tokens).
+    """
+    pieces = [piece for section in split_sections(text) for piece in split_to_budget(section, max_tokens)]
+
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens, separator in pieces:
+        if separator is None:
+            separator = SECTION_SEPARATOR
+        separator_tokens = count_tokens(separator) if current else 0
+        if current and current_tokens + separator_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens, separator_tokens = [], 0, 0
+        current.append(separator + piece if current else piece)
+        current_tokens += separator_tokens + tokens
+    if current:
+        chunks.append("".join(current))
+    # Counted on the final text, so the budget and cache see exactly what is sent
+    return [(chunk, count_tokens(chunk)) for chunk in chunks]
+
+def cost_for_tokens(input_tokens, output_tokens):
+    return (input_tokens / 1000) * COST_PER_1K_INPUT + (output_tokens / 1000) * COST_PER_1K_OUTPUT
+
+def estimate_tokens_and_cost_for_text(text, cursor=None):
+    """Estimate tokens and cost for summarizing one bill.
+
+    With a cursor, chunks already in the chunk-summary cache are left out of the
+    totals. Returns (input_tokens, output_tokens, cost, num_chunks, cached_chunks).
+    """
+    chunks = chunk_bill_text(text)
+    keys = [cache_key(chunk, CHUNK_PROMPT, MODEL) for chunk, _ in chunks]
+    present = cached_keys(cursor, keys) if cursor else set()
 
     total_input_tokens = 0
     total_output_tokens = 0
+    cached_chunks = 0
 
-    for chunk in chunks:
+    for (chunk, _), key in zip(chunks, keys):
+        if key in present:
+            cached_chunks += 1
+            continue
         prompt_tokens = count_tokens(CHUNK_PROMPT + chunk)
         total_input_tokens += prompt_tokens
         total_output_tokens += 150  # assume ~150 tokens output per chunk summary
@@ -39,43 +144,58 @@ def estimate_tokens_and_cost_for_text(text):
     total_input_tokens += final_input_tokens
     total_output_tokens += final_output_tokens
 
-    input_cost = (total_input_tokens / 1000) * COST_PER_1K_INPUT
-    output_cost = (total_output_tokens / 1000) * COST_PER_1K_OUTPUT
-    total_cost = input_cost + output_cost
+    total_cost = cost_for_tokens(total_input_tokens, total_output_tokens)
 
-    return total_input_tokens, total_output_tokens, total_cost
+    return total_input_tokens, total_output_tokens, total_cost, len(chunks), cached_chunks
 
 def run_estimate(limit=None):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    cursor = db.reader().cursor()
 
     cursor.execute("""
-        SELECT bill_id, full_text FROM bills
-        WHERE summary IS NULL AND full_text IS NOT NULL AND status IN (4, 5, 6)
-        ORDER BY status_date DESC
+        SELECT bills.bill_id, bill_texts.codec, bill_texts.text FROM bills
+        JOIN bill_texts ON bill_texts.bill_id = bills.bill_id
+        WHERE bills.summary IS NULL AND bills.status IN (4, 5, 6)
+        ORDER BY bills.status_date DESC
         LIMIT ?""" if limit else """
-        SELECT bill_id, full_text FROM bills
-        WHERE summary IS NULL AND full_text IS NOT NULL AND status IN (4, 5, 6)
+        SELECT bills.bill_id, bill_texts.codec, bill_texts.text FROM bills
+        JOIN bill_texts ON bill_texts.bill_id = bills.bill_id
+        WHERE bills.summary IS NULL AND bills.status IN (4, 5, 6)
     """, (limit,) if limit else ())
 
     rows = cursor.fetchall()
-    conn.close()
 
     grand_total_input = 0
     grand_total_output = 0
     grand_total_cost = 0
-
-    for bill_id, full_text in rows:
-        input_tokens, output_tokens, cost = estimate_tokens_and_cost_for_text(full_text)
+    chunk_counts = []
+    total_cached_chunks = 0
+
+    for bill_id, codec, blob in rows:
+        full_text = decompress_text(blob, codec)
+        input_tokens, output_tokens, cost, num_chunks, cached_chunks = estimate_tokens_and_cost_for_text(full_text, cursor)
+        chunk_counts.append(num_chunks)
+        total_cached_chunks += cached_chunks
         grand_total_input += input_tokens
         grand_total_output += output_tokens
         grand_total_cost += cost
 
     print("📊 Token and Cost Estimate")
     print(f"🧾 Bills analyzed: {len(rows)}")
+    if chunk_counts:
+        print(f"✂️ Chunks: {sum(chunk_counts):,} total, {sum(chunk_counts) / len(chunk_counts):.1f} per bill, max {max(chunk_counts)} ({CHUNK_TOKEN_BUDGET}-token budget)")
     print(f"📥 Total input tokens: {grand_total_input:,}")
     print(f"📤 Total output tokens: {grand_total_output:,}")
     print(f"💸 Estimated total cost: ${grand_total_cost:.2f}")
+    if total_cached_chunks:
+        print(f"♻️ {total_cached_chunks:,} chunks already cached and excluded from the estimate")
+
+    stats = cache_stats(cursor)
+    lookups = stats["hits"] + stats["misses"]
+    saved = cost_for_tokens(stats["saved_input_tokens"], stats["saved_output_tokens"])
+    print("🗃️ Chunk summary cache")
+    print(f"   {stats['entries']:,} entries, {stats['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"   Hit rate: {stats['hits'] / lookups if lookups else 0:.1%} ({stats['hits']:,} hits / {stats['misses']:,} misses)")
+    print(f"   Saved so far: ${saved:.2f} ({stats['saved_input_tokens']:,} input + {stats['saved_output_tokens']:,} output tokens)")
 
 if __name__ == "__main__":
     run_estimate()  # Adjust or remove limit as needed
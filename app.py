@@ -1,14 +1,18 @@
 import os
-import json
 import requests
-import sqlite3
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
-import openai
-from config import DB_FILE, TOPIC_CATEGORIES
+import db
+from initialize_database import check_query_plans
+from bill_texts import load_full_text
+from bill_topics import topic_filter
+from final_votes import recent_final_votes_query
+from topic_index import LiveTopicIndex
+from summary_queue import enqueue_summaries, summary_status
+from response_cache import TTLCache, StaleWhileRevalidateCache, normalize_address, location_key
+import http_client
 import logging
-from transformers import pipeline
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(
@@ -29,21 +33,43 @@ if not all([GOOGLE_MAPS_API_KEY, FIVE_CALLS_API_KEY, OPENAI_API_KEY, NEWS_API_KE
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})  # Allow frontend requests
 
+# Fail at startup, not under load, if the hot queries would full-scan the database
+# (the published snapshot's, with USE_SNAPSHOT=1)
+check_query_plans(path=db.current_snapshot())
+
+# Addresses don't move, and representatives change at most once per election cycle
+geocode_cache = TTLCache("geocode", ttl_seconds=30 * 24 * 3600)
+representatives_cache = TTLCache("representatives", ttl_seconds=7 * 24 * 3600)
+
+# Topic-only searches are answered from in-memory bitmaps (loaded from the
+# snapshot written by `python topic_index.py` when it is current)
+topic_index = LiveTopicIndex()
+
 # ----------------------------
 # 📍 Step 1: Geocode Address
 # ----------------------------
 def geocode_address(address):
     """Convert an address into latitude/longitude using Google Maps API."""
+    cache_key = normalize_address(address)
+    cached = geocode_cache.get(cache_key)
+    if cached:
+        return tuple(cached), None
+
     url = "https://maps.googleapis.com/maps/api/geocode/json"
     params = {"address": address, "key": GOOGLE_MAPS_API_KEY}
 
-    response = requests.get(url, params=params)
-    data = response.json()
+    try:
+        response = http_client.get("geocode", url, params=params)
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        logging.warning(f"⚠️ Geocoding request failed: {e}")
+        return None, "Geocoding service unavailable."
 
     if response.status_code != 200 or "results" not in data or not data["results"]:
         return None, "Geocoding failed. Invalid address."
 
     location = data["results"][0]["geometry"]["location"]
+    geocode_cache.set(cache_key, [location["lat"], location["lng"]])
     return (location["lat"], location["lng"]), None
 
 # ----------------------------
@@ -51,11 +77,20 @@ def geocode_address(address):
 # ----------------------------
 def get_representatives(lat, lng):
     """Fetch representatives based on latitude/longitude using Five Calls API."""
+    cache_key = location_key(lat, lng)
+    cached = representatives_cache.get(cache_key)
+    if cached:
+        return cached, None
+
     url = "https://api.5calls.org/v1/representatives"
     params = {"location": f"{lat},{lng}"}
     headers = {"X-5Calls-Token": FIVE_CALLS_API_KEY}
 
-    response = requests.get(url, params=params, headers=headers)
+    try:
+        response = http_client.get("fivecalls", url, params=params, headers=headers)
+    except requests.RequestException as e:
+        logging.warning(f"⚠️ Five Calls request failed: {e}")
+        return None, "Five Calls API error."
     if response.status_code != 200:
         return None, "Five Calls API error."
 
@@ -63,145 +98,48 @@ def get_representatives(lat, lng):
     if "representatives" not in data or not data["representatives"]:
         return None, "No representatives found."
 
+    representatives_cache.set(cache_key, data["representatives"])
     return data["representatives"], None
 
-# ----------------------------
-# 📝 Step 3: Use AI to Summarize Bills
-# ----------------------------
-def summarize_and_store_bill(bill_id, vote_text=None, outcome=None, topic=None, legislator=None):
-    """Summarize a full bill using chunked summarization if needed."""
-    MAX_CHUNKS = 30
-    MAX_CHUNKS_FOR_FINAL_SUMMARY = 20
-    MAX_FINAL_SUMMARY_LENGTH = 8000  # characters
-
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT summary, full_text, title, description FROM bills WHERE bill_id = ?", (bill_id,))
-    row = cursor.fetchone()
-    if not row:
-        logging.warning(f"Bill {bill_id} not found in DB.")
-        conn.close()
-        return "Bill not found."
-
-    summary, full_text, title, description = row
-
-    if summary:
-        logging.info(f"📄 Summary for bill {bill_id} reused for legislator: {legislator.get('name') if legislator else 'Unknown'}")
-        conn.close()
-        return summary
-
-    if not full_text or len(full_text.strip()) < 100:
-        logging.warning(f"❌ No usable full text found for bill {bill_id}.")
-        conn.close()
-        return "No full text available for summarization."
-
-    try:
-        # Step 1: Chunk the full text
-        chunks = chunk_text(full_text, max_chunk_size=1500)
-        logging.info(f"✂️ Bill {bill_id} split into {len(chunks)} chunks.")
-
-        if len(chunks) > MAX_CHUNKS:
-            logging.warning(f"⚠️ Truncating bill {bill_id} to {MAX_CHUNKS} chunks.")
-            chunks = chunks[:MAX_CHUNKS]
-
-        client = openai.OpenAI(api_key=openai.api_key)
-        chunk_summaries = []
-
-        # Step 2: Summarize each chunk
-        for i, chunk in enumerate(chunks):
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Summarize this section of a legislative bill clearly and concisely."},
-                    {"role": "user", "content": chunk}
-                ]
-            )
-            chunk_summary = response.choices[0].message.content.strip()
-            chunk_summaries.append(chunk_summary)
-            logging.info(f"✅ Bill {bill_id} chunk {i+1}/{len(chunks)} summarized.")
-
-        # Step 3: Prepare combined summary
-        limited_summaries = chunk_summaries[:MAX_CHUNKS_FOR_FINAL_SUMMARY]
-        combined_summary_text = "\n".join(limited_summaries)
-        outcome_text = outcome or "This bill received a final vote."
-        vote_line = f"The legislator voted: {vote_text}." if vote_text else ""
-
-        # Step 4: Ensure topic classification
-        if not topic or not topic.strip():
-            logging.info(f"🏷️ Bill {bill_id} has no topic. Attempting classification...")
-            topic = classify_bill_if_needed(
-                bill_id=bill_id,
-                title=title,
-                description=description,
-                full_text=full_text,
-                existing_topic=topic
-            )
-
-        # Step 5: Final AI summary
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": (
-                        f"Combine the following section summaries into a single, plain-English summary of the bill. "
-                        f"{outcome_text} "
-                        f"The bill is categorized under the topic(s): {topic}. "
-                        f"Explain the bill's intended purpose and how it could affect these topics. "
-                        f"Then, briefly highlight potential benefits, as well as possible downsides or tradeoffs, in a way that's accessible to regular voters. "
-                        f"Be concise, informative, and maintain a neutral tone."
-                    )},
-                    {"role": "user", "content": combined_summary_text[:MAX_FINAL_SUMMARY_LENGTH]}
-                ]
-            )
-            final_summary = response.choices[0].message.content.strip()
-            final_summary = " ".join(final_summary.split())  # optional whitespace cleanup
-            logging.info(f"🧠 Final AI summary created for bill {bill_id}.")
-
-        except Exception as e:
-            logging.error(f"⚠️ Final summary failed for bill {bill_id}: {e}")
-            final_summary = combined_summary_text[:MAX_FINAL_SUMMARY_LENGTH] + "\n\n(Note: Full summary truncated due to token limits or errors)"
-
-        # Step 6: Store final summary
-        cursor.execute("UPDATE bills SET summary = ? WHERE bill_id = ?", (final_summary, bill_id))
-        conn.commit()
-        conn.close()
-
-        return final_summary
-
-    except Exception as e:
-        logging.error(f"⚠️ AI summarization failed for bill {bill_id}: {e}")
-        cursor.execute("UPDATE bills SET summary = ? WHERE bill_id = ?", (
-            "Summary unavailable: this bill may be too long or triggered an API error.",
-            bill_id
-        ))
-        conn.commit()
-        conn.close()
-        return "AI failed to summarize."
-
-    
-def chunk_text(text, max_chunk_size=1500):
-    """Split long text into manageable chunks."""
-    return [text[i:i + max_chunk_size] for i in range(0, len(text), max_chunk_size)]
-
-
 # ----------------------------
 # 📜 Step 4: Fetch Legislative Activity
 # ----------------------------
-def get_legislation_for_rep(fivecalls_id, topics=None, match_behavior="any"):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+BILLS_PER_REP = 2
+
+def find_people(cursor, bioguide_ids):
+    """Resolve bioguide ids in one query: {bioguide_id: (people_id, name, party, district)}."""
+    if not bioguide_ids:
+        return {}
+    placeholders = ",".join("?" * len(bioguide_ids))
+    cursor.execute(
+        f"SELECT bioguide_id, people_id, name, party, district FROM people WHERE bioguide_id IN ({placeholders})",
+        list(bioguide_ids)
+    )
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def get_legislation_for_reps(cursor, people, topics=None, match_behavior="any"):
+    """Most recent final-vote bills for every rep in one query.
+
+    `people` is find_people() output; returns {bioguide_id: legislation}. Bills
+    without a summary are queued for the background workers in a single batch.
+    """
+    if not people:
+        return {}
 
-    cursor.execute("SELECT people_id, name, party, district FROM people WHERE bioguide_id = ?", (fivecalls_id,))
-    person = cursor.fetchone()
-    if not person:
-        conn.close()
-        return {"bioguide_id": fivecalls_id, "error": "No matching legislator found"}
+    by_people_id = {person[0]: bioguide_id for bioguide_id, person in people.items()}
 
-    people_id, name, party, district = person
+    topic_clause = ""
+    topic_params = []
+    if topics:
+        subquery, topic_params = topic_filter(topics, match_behavior)
+        topic_clause = f"AND bill_id IN ({subquery})"
+    params = [param for people_id in by_people_id for param in [people_id, *topic_params]]
 
-    sql_query = """
+    # Each rep's BILLS_PER_REP latest bills come off legislator_final_votes
+    # (refreshed by the data loaders); bills only adds the display columns.
+    cursor.execute(f"""
         SELECT
+            recent.people_id,
             bills.bill_id,
             bills.title,
             bills.description,
@@ -210,80 +148,57 @@ def get_legislation_for_rep(fivecalls_id, topics=None, match_behavior="any"):
             bills.url,
             bills.summary,
             bills.topic,
-            bills.full_text,
-            legislator_votes.vote_text AS legislator_vote,
-            MAX(votes.date) AS most_recent_vote_date,
-            MAX(votes.yea) AS total_yea,
-            MAX(votes.nay) AS total_nay,
-            MAX(votes.passed) AS passed
-        FROM legislator_votes
-        JOIN votes ON legislator_votes.roll_call_id = votes.roll_call_id
-        JOIN bills ON votes.bill_id = bills.bill_id
-        WHERE legislator_votes.people_id = ?
-          AND bills.status IN (4, 5, 6)
-    """
-
-    params = [people_id]
-
-    if topics:
-        topics = [t.strip() for t in topics]
-
-        if match_behavior == "all":
-            topic_condition = ' AND '.join(["bills.topic LIKE ?"] * len(topics))
+            recent.vote_text,
+            recent.last_vote_date,
+            recent.yea,
+            recent.nay,
+            recent.passed
+        FROM ({recent_final_votes_query(len(by_people_id), BILLS_PER_REP, topic_clause)}) AS recent
+        JOIN bills ON bills.bill_id = recent.bill_id
+        ORDER BY recent.people_id, recent.status_date DESC, recent.bill_id DESC
+    """, params)
+    rows = cursor.fetchall()
+
+    # Queue every missing summary across all reps in one transaction
+    missing = {row[1]: (row[9], outcome_from_status(row[4]), row[8]) for row in rows if not row[7]}
+    statuses = db.write(enqueue_summaries, missing) if missing else {}
+
+    legislation = {
+        bioguide_id: {"people_id": person[0], "district": person[3], "bills": []}
+        for bioguide_id, person in people.items()
+    }
+    for row in rows:
+        bill_id, summary = row[1], row[7]
+        if summary:
+            summary_state = "done"
         else:
-            topic_condition = ' OR '.join(["bills.topic LIKE ?"] * len(topics))
-
-        sql_query += f" AND ({topic_condition})"
-        params.extend([f'%{topic}%' for topic in topics])
+            # Generated in the background by summary_queue.py; clients poll summary_url
+            summary_state = statuses.get(bill_id)
+            if summary_state == "done":
+                summary_state = "unavailable"  # the job ran but there was nothing to summarize
 
-    sql_query += """
-        GROUP BY bills.bill_id
-        ORDER BY bills.status_date DESC
-        LIMIT 2;
-    """
-
-    cursor.execute(sql_query, params)
-    results = cursor.fetchall()
-
-    legislation_results = []
-    for row in results:
-        bill_data = {
+        legislation[by_people_id[row[0]]]["bills"].append({
             "bill": {
-                "bill_id": row[0],
-                "title": row[1],
-                "description": row[2],
-                "status": row[3],
-                "status_date": row[4],
-                "url": row[5],
-                "summary": summarize_and_store_bill(
-                    bill_id=row[0],
-                    vote_text=row[9],
-                    outcome=outcome_from_status(row[3]),
-                    topic=row[7],
-                    legislator={
-                        "name": name,
-                        "party": party,
-                        "district": district
-                    }
-                ),
-                "topic": row[7],
-                "full_text": row[8]
+                "bill_id": bill_id,
+                "title": row[2],
+                "description": row[3],
+                "status": row[4],
+                "status_date": row[5],
+                "url": row[6],
+                "summary": summary,
+                "summary_status": summary_state,
+                "summary_url": f"/api/bills/{bill_id}/summary",
+                "topic": row[8],
+                "full_text_url": f"/api/bills/{bill_id}/text"  # fetched lazily, not inlined
             },
             "vote_text": row[9],
             "most_recent_vote_date": row[10],
             "total_yea": row[11],
             "total_nay": row[12],
             "passed": bool(row[13])
-        }
-        legislation_results.append(bill_data)
+        })
 
-    conn.close()
-
-    return {
-        "people_id": people_id,
-        "district": district,
-        "bills": legislation_results
-    }
+    return legislation
 
 def outcome_from_status(status):
     if status == 4:
@@ -318,26 +233,19 @@ def representatives():
         if error:
             return jsonify({"error": error}), 400
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    cursor = db.reader().cursor()
 
     rep_legislation = {}
 
     if not reps:
         rep_legislation["Bills Matching Selected Topics"] = get_bills_by_topics(cursor, topics, match_behavior)
     else:
+        people = find_people(cursor, {rep.get("id", "UNKNOWN") for rep in reps})
+        legislation = get_legislation_for_reps(cursor, people, topics if topics else None, match_behavior)
         for rep in reps:
-            fivecalls_id = rep.get("id", "UNKNOWN")
-            cursor.execute("SELECT people_id FROM people WHERE bioguide_id = ?", (fivecalls_id,))
-            person = cursor.fetchone()
-
-            if person:
-                legislation = get_legislation_for_rep(fivecalls_id, topics if topics else None, match_behavior)
-                rep_legislation[rep["name"]] = legislation
-            else:
-                rep_legislation[rep["name"]] = {"error": "Legislator not found in database"}
-
-    conn.close()
+            rep_legislation[rep["name"]] = legislation.get(
+                rep.get("id", "UNKNOWN"), {"error": "Legislator not found in database"}
+            )
 
     return jsonify({"representatives": reps, "legislation": rep_legislation})
 
@@ -346,24 +254,18 @@ def get_bills_by_topics(cursor, topics, match_behavior):
     if not topics:
         return []
 
-    # Clean whitespace just in case
-    topics = [topic.strip() for topic in topics]
-
-    if match_behavior == "all":
-        condition = ' AND '.join(["bills.topic LIKE ?"] * len(topics))
-    else:
-        condition = ' OR '.join(["bills.topic LIKE ?"] * len(topics))
-
-    params = [f'%{topic}%' for topic in topics]
+    bill_ids = topic_index.search(topics, match_behavior, limit=10)
+    if not bill_ids:
+        return []
 
-    query = f"""
+    placeholders = ",".join("?" * len(bill_ids))
+    cursor.execute(f"""
         SELECT bill_id, title, description, summary, topic, url
-        FROM bills WHERE {condition}
-        ORDER BY status_date DESC LIMIT 10;
-    """
-
-    cursor.execute(query, params)
-    results = cursor.fetchall()
+        FROM bills WHERE bill_id IN ({placeholders});
+    """, bill_ids)
+    rows = {row[0]: row for row in cursor.fetchall()}
+    # Keep the index's newest-first order
+    results = [rows[bill_id] for bill_id in bill_ids if bill_id in rows]
 
     return [{
         "bill": {
@@ -377,53 +279,6 @@ def get_bills_by_topics(cursor, topics, match_behavior):
     } for row in results]
 
 
-# Load once at module level to avoid reloading on each request
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-
-# ----------------------------
-# 🎨 Classify bills, if needed
-# ----------------------------
-
-def classify_bill_if_needed(bill_id, title=None, description=None, full_text=None, existing_topic=None):
-    """Run AI classification using full_text if available. Save results in DB."""
-
-    if existing_topic and existing_topic.strip():
-        return existing_topic
-
-    base_text = full_text if full_text and len(full_text.strip()) > 100 else description
-    if not base_text or len(base_text.strip()) < 20:
-        topic_str = "Miscellaneous"
-        score_json = json.dumps({"Miscellaneous": 1.0})
-    else:
-        input_text = f"Title: {title}\n{base_text[:2000]}"
-
-        try:
-            result = classifier(input_text, TOPIC_CATEGORIES, multi_label=True)
-            topics = [label for label, score in zip(result["labels"], result["scores"]) if score > 0.6]
-            if not topics:
-                topics = [result["labels"][0]]  # fallback to best match
-
-            topic_str = ", ".join(topics)
-            score_json = json.dumps(dict(zip(result["labels"], result["scores"])))
-
-        except Exception as e:
-            logging.warning(f"⚠️ Failed to classify bill {bill_id}: {e}")
-            topic_str = "Miscellaneous"
-            score_json = json.dumps({"Miscellaneous": 1.0})
-
-    # ✅ Save topic and scores to DB
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE bills SET topic = ?, topic_scores = ? WHERE bill_id = ?", (topic_str, score_json, bill_id))
-        conn.commit()
-        conn.close()
-        logging.info(f"🏷️ Bill {bill_id} classified as: {topic_str}")
-    except Exception as e:
-        logging.error(f"❌ DB error while saving topic for bill {bill_id}: {e}")
-
-    return topic_str
-
 # ----------------------------
 # Get news articles for a representative
 # ----------------------------
@@ -457,7 +312,7 @@ def fetch_news_for_representative(name, state=None, district=None):
         "language": "en",
     }
 
-    resp = requests.get(url, params=params)
+    resp = http_client.get("newsapi", url, params=params)
     resp.raise_for_status()
 
     articles = resp.json().get("articles", [])
@@ -476,6 +331,18 @@ def fetch_news_for_representative(name, state=None, district=None):
         ]
     }
 
+# One pool for the whole process (at most 5 NewsAPI calls at once). Everyone in a
+# state asks about the same senators, so results are cached per name: served
+# fresh for 15 minutes, then served stale for up to 6 hours while one background
+# refresh runs.
+news_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="news")
+news_cache = StaleWhileRevalidateCache(
+    fetch_news_for_representative,
+    fresh_seconds=15 * 60,
+    stale_seconds=6 * 3600,
+    executor=news_executor
+)
+
 @app.route('/api/representative-news', methods=['POST'])
 def representative_news():
     """
@@ -487,18 +354,61 @@ def representative_news():
     reps = request.get_json().get("representatives", [])
     names = [r["name"] for r in reps]
 
+    # Cached names resolve immediately; the rest are fetched concurrently on news_executor
+    # (repeated names share one fetch)
+    futures = [(nm, news_cache.lookup(nm)) for nm in names]
     results = []
-    # Parallelize up to 5 concurrent NewsAPI calls
-    with ThreadPoolExecutor(max_workers=5) as pool:
-        futures = { pool.submit(fetch_news_for_representative, nm): nm for nm in names }
-        for fut in as_completed(futures):
-            try:
-                results.append(fut.result())
-            except Exception as e:
-                results.append({ "name": futures[fut], "error": str(e) })
+    for nm, fut in futures:
+        try:
+            results.append(fut.result())
+        except Exception as e:
+            results.append({ "name": nm, "error": str(e) })
 
     return jsonify({ "news": results })
 
+# ----------------------------
+# 🌐 Outbound API latency (this worker)
+# ----------------------------
+@app.route('/api/http-latency', methods=['GET'])
+def http_latency():
+    """Per-upstream request counts, errors and latency histogram for this worker process."""
+    return jsonify(http_client.latency_stats())
+
+# ----------------------------
+# 📄 Full bill text (lazy)
+# ----------------------------
+@app.route('/api/bills/<int:bill_id>/text', methods=['GET'])
+def bill_text(bill_id):
+    """Serves a bill's full text on demand so it never rides along in search responses."""
+    full_text = load_full_text(db.reader().cursor(), bill_id)
+
+    if full_text is None:
+        return jsonify({"bill_id": bill_id, "error": "No full text available"}), 404
+
+    return jsonify({"bill_id": bill_id, "full_text": full_text})
+
+# ----------------------------
+# 📝 Bill summary status (poll while pending)
+# ----------------------------
+@app.route('/api/bills/<int:bill_id>/summary', methods=['GET'])
+def bill_summary(bill_id):
+    """Returns a bill's summary, or the state of its background summary job."""
+    cursor = db.reader().cursor()
+    cursor.execute("SELECT summary FROM bills WHERE bill_id = ?", (bill_id,))
+    row = cursor.fetchone()
+    status = summary_status(cursor, bill_id)
+
+    if not row:
+        return jsonify({"bill_id": bill_id, "error": "Bill not found"}), 404
+
+    summary = row[0]
+    if summary:
+        status = "done"
+    elif status == "done":
+        status = "unavailable"  # the job ran but there was nothing to summarize
+
+    return jsonify({"bill_id": bill_id, "summary_status": status, "summary": summary})
+
 # ----------------------------
 # 🎨 Serve Frontend
 # ----------------------------
@@ -0,0 +1,69 @@
+import zlib
+import logging
+
+# ----------------------------
+# 📦 Compressed bill text storage
+# ----------------------------
+# Extracted bill texts can run to hundreds of KB each. They live zlib-compressed in
+# the bill_texts side table so the bills rows that every request reads stay small.
+CODEC = "zlib"
+COMPRESSION_LEVEL = 6
+MIGRATE_BATCH_SIZE = 500
+
+def compress_text(text):
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+def decompress_text(blob, codec=CODEC):
+    if blob is None:
+        return None
+    if codec != CODEC:
+        raise ValueError(f"Unknown bill text codec: {codec}")
+    return zlib.decompress(blob).decode("utf-8")
+
+def bill_text_row(bill_id, text):
+    """Row for bill_texts: (bill_id, codec, raw_size, compressed_size, text)."""
+    blob = compress_text(text)
+    return (bill_id, CODEC, len(text.encode("utf-8")), len(blob), blob)
+
+def store_full_texts(cursor, texts):
+    """Store (bill_id, text) pairs, replacing any previous text for those bills."""
+    cursor.executemany('''
+        INSERT INTO bill_texts (bill_id, codec, raw_size, compressed_size, text)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(bill_id) DO UPDATE SET
+            codec=excluded.codec,
+            raw_size=excluded.raw_size,
+            compressed_size=excluded.compressed_size,
+            text=excluded.text
+    ''', [bill_text_row(bill_id, text) for bill_id, text in texts])
+
+def store_full_text(cursor, bill_id, text):
+    store_full_texts(cursor, [(bill_id, text)])
+
+def load_full_text(cursor, bill_id):
+    """Return the decompressed full text for a bill, or None if none was fetched."""
+    cursor.execute("SELECT codec, text FROM bill_texts WHERE bill_id = ?", (bill_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    codec, blob = row
+    return decompress_text(blob, codec)
+
+def migrate_inline_texts(conn):
+    """Move any texts still stored inline in bills.full_text into bill_texts."""
+    read_cursor = conn.cursor()
+    write_cursor = conn.cursor()
+    read_cursor.execute("SELECT bill_id, full_text FROM bills WHERE full_text IS NOT NULL")
+
+    moved = 0
+    while True:
+        rows = read_cursor.fetchmany(MIGRATE_BATCH_SIZE)
+        if not rows:
+            break
+        store_full_texts(write_cursor, rows)
+        moved += len(rows)
+
+    if moved:
+        write_cursor.execute("UPDATE bills SET full_text = NULL WHERE full_text IS NOT NULL")
+        conn.commit()
+        logging.info(f"📦 Moved {moved} inline bill texts into bill_texts (VACUUM to reclaim the space).")
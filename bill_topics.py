@@ -0,0 +1,93 @@
+import json
+import logging
+
+# ----------------------------
+# 🏷️ Normalized bill topics
+# ----------------------------
+# bills.topic holds a display string like "Healthcare, Taxes". For filtering,
+# every selected topic is also a (bill_id, topic, score) row in bill_topics,
+# indexed on (topic, bill_id), so topic searches are exact, index-backed set
+# operations instead of LIKE '%topic%' scans.
+BACKFILL_BATCH_SIZE = 1000
+# data_versions row bumped whenever topics or bill ordering change, so in-memory
+# topic indexes (topic_index.py) know to rebuild
+TOPIC_INDEX_VERSION = "topic_index"
+
+def bump_data_version(cursor, name=TOPIC_INDEX_VERSION):
+    cursor.execute('''
+        INSERT INTO data_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''', (name,))
+
+def data_version(cursor, name=TOPIC_INDEX_VERSION):
+    cursor.execute("SELECT version FROM data_versions WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def split_topics(topic_str):
+    return [topic.strip() for topic in (topic_str or "").split(",") if topic.strip()]
+
+def topic_rows(bill_id, topic_str, score_json):
+    """bill_topics rows for one bill's selected topics, with their classifier scores."""
+    try:
+        scores = json.loads(score_json) if score_json else {}
+    except ValueError:
+        scores = {}
+    return [(bill_id, topic, scores.get(topic)) for topic in dict.fromkeys(split_topics(topic_str))]
+
+def store_bill_topics(cursor, updates):
+    """Write classification results: (topic_str, score_json, bill_id) tuples.
+
+    Updates bills.topic / bills.topic_scores and replaces the bills' bill_topics
+    rows, so every classifier writes both through this one function.
+    """
+    updates = list(updates)
+    cursor.executemany("UPDATE bills SET topic = ?, topic_scores = ? WHERE bill_id = ?", updates)
+    cursor.executemany("DELETE FROM bill_topics WHERE bill_id = ?", [(bill_id,) for _, _, bill_id in updates])
+    cursor.executemany(
+        "INSERT INTO bill_topics (bill_id, topic, score) VALUES (?, ?, ?)",
+        [row for topic_str, score_json, bill_id in updates for row in topic_rows(bill_id, topic_str, score_json)]
+    )
+    if updates:
+        bump_data_version(cursor)
+
+def backfill_bill_topics(conn):
+    """Fill bill_topics for classified bills that have no rows there yet."""
+    read_cursor = conn.cursor()
+    write_cursor = conn.cursor()
+    read_cursor.execute('''
+        SELECT bill_id, topic, topic_scores FROM bills
+        WHERE topic IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM bill_topics WHERE bill_topics.bill_id = bills.bill_id)
+    ''')
+
+    filled = 0
+    while True:
+        rows = read_cursor.fetchmany(BACKFILL_BATCH_SIZE)
+        if not rows:
+            break
+        write_cursor.executemany(
+            "INSERT OR IGNORE INTO bill_topics (bill_id, topic, score) VALUES (?, ?, ?)",
+            [row for bill_id, topic_str, score_json in rows for row in topic_rows(bill_id, topic_str, score_json)]
+        )
+        filled += len(rows)
+
+    if filled:
+        bump_data_version(write_cursor)
+        conn.commit()
+        logging.info(f"🏷️ Backfilled bill_topics for {filled} classified bills.")
+
+def topic_filter(topics, match_behavior="any"):
+    """Subquery of matching bill_ids and its params, for `bills.bill_id IN (...)`.
+
+    "any" is the union of the topics' bill sets (one index range per topic);
+    "all" is their intersection, via GROUP BY ... HAVING COUNT.
+    """
+    topics = list(dict.fromkeys(topic.strip() for topic in topics))
+    placeholders = ",".join("?" * len(topics))
+    if match_behavior == "all":
+        return (
+            f"SELECT bill_id FROM bill_topics WHERE topic IN ({placeholders}) "
+            f"GROUP BY bill_id HAVING COUNT(*) = {len(topics)}"
+        ), topics
+    return f"SELECT bill_id FROM bill_topics WHERE topic IN ({placeholders})", topics
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import hashlib
+
+# ----------------------------
+# 🗃️ Content-addressed chunk summary cache
+# ----------------------------
+# Boilerplate sections and companion House/Senate bills repeat the same text, so
+# chunk summaries are stored under a hash of (model, prompt, normalized chunk)
+# and reused by any bill that produces the same chunk. The table is kept under
+# CHUNK_CACHE_MAX_BYTES by evicting the least recently used entries.
+CHUNK_CACHE_MAX_BYTES = int(os.getenv("CHUNK_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+STAT_COUNTERS = ("hits", "misses", "saved_input_tokens", "saved_output_tokens")
+
+def normalize_chunk(text):
+    """Collapse whitespace so re-flowed copies of the same section share a key."""
+    return " ".join(text.split())
+
+def cache_key(chunk, prompt, model):
+    payload = json.dumps([model, prompt, normalize_chunk(chunk)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def bump_stats(cursor, **deltas):
+    cursor.executemany('''
+        INSERT INTO chunk_cache_stats (counter, value) VALUES (?, ?)
+        ON CONFLICT(counter) DO UPDATE SET value = value + excluded.value
+    ''', [(name, delta) for name, delta in deltas.items() if delta])
+
+def cached_keys(cursor, keys):
+    """The subset of keys present in the cache. Read-only: no hit counting, no LRU update."""
+    keys = list(dict.fromkeys(keys))
+    present = set()
+    for i in range(0, len(keys), 500):
+        batch = keys[i:i + 500]
+        cursor.execute(f"SELECT key FROM chunk_summaries WHERE key IN ({','.join('?' * len(batch))})", batch)
+        present.update(key for key, in cursor.fetchall())
+    return present
+
+def lookup_summaries(cursor, keys):
+    """Return {key: summary} for the cached keys, marking them used and counting hits and misses.
+
+    Each key is counted once per call, so a chunk repeated inside one bill is a
+    single miss (it is only summarized once).
+    """
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    saved_input = saved_output = 0
+    # Stay well under SQLite's bound-parameter limit
+    for i in range(0, len(keys), 500):
+        batch = keys[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        cursor.execute(f'''
+            SELECT key, summary, input_tokens, output_tokens FROM chunk_summaries
+            WHERE key IN ({placeholders})
+        ''', batch)
+        for key, summary, input_tokens, output_tokens in cursor.fetchall():
+            found[key] = summary
+            saved_input += input_tokens
+            saved_output += output_tokens
+
+    if found:
+        cursor.executemany(
+            "UPDATE chunk_summaries SET hits = hits + 1, last_used_at = ? WHERE key = ?",
+            [(time.time(), key) for key in found]
+        )
+    bump_stats(
+        cursor,
+        hits=len(found),
+        misses=len(keys) - len(found),
+        saved_input_tokens=saved_input,
+        saved_output_tokens=saved_output
+    )
+    return found
+
+def store_summaries(cursor, entries, max_bytes=CHUNK_CACHE_MAX_BYTES):
+    """Store (key, summary, input_tokens, output_tokens) entries, then evict down to max_bytes."""
+    now = time.time()
+    cursor.executemany('''
+        INSERT INTO chunk_summaries (key, summary, input_tokens, output_tokens, size, hits, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET summary = excluded.summary, last_used_at = excluded.last_used_at
+    ''', [
+        (key, summary, input_tokens, output_tokens, len(key) + len(summary.encode("utf-8")), now, now)
+        for key, summary, input_tokens, output_tokens in entries
+    ])
+    evict(cursor, max_bytes)
+
+def evict(cursor, max_bytes=CHUNK_CACHE_MAX_BYTES):
+    """Drop least recently used entries beyond max_bytes. Returns the number evicted."""
+    cursor.execute("SELECT COALESCE(SUM(size), 0) FROM chunk_summaries")
+    if cursor.fetchone()[0] <= max_bytes:
+        return 0
+    cursor.execute('''
+        DELETE FROM chunk_summaries WHERE key IN (
+            SELECT key FROM (
+                SELECT key, SUM(size) OVER (ORDER BY last_used_at DESC, key) AS running
+                FROM chunk_summaries
+            ) WHERE running > ?
+        )
+    ''', (max_bytes,))
+    return cursor.rowcount
+
+def cache_stats(cursor):
+    """Counters plus current size: {'hits', 'misses', 'saved_input_tokens', 'saved_output_tokens', 'entries', 'bytes'}."""
+    stats = dict.fromkeys(STAT_COUNTERS, 0)
+    cursor.execute("SELECT counter, value FROM chunk_cache_stats")
+    stats.update(cursor.fetchall())
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunk_summaries")
+    stats["entries"], stats["bytes"] = cursor.fetchone()
+    return stats
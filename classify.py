@@ -1,28 +1,62 @@
-import sqlite3
+import os
 import time
+import argparse
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from transformers import pipeline
 from tqdm import tqdm
-from config import DB_FILE, TOPIC_CATEGORIES
+import db
+from config import TOPIC_CATEGORIES, CLASSIFIER_BACKEND
+from bill_texts import decompress_text
+from bill_topics import store_bill_topics
 import json
 
 # ✅ Classification config
 BATCH_SIZE = 10
 NUM_THREADS = 4
 MAX_INPUT_CHARS = 2000
+TOPIC_THRESHOLD = 0.6
 
-# ✅ Load classification model
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# ✅ Batched mode config
+DB_BATCH_SIZE = 64          # bills fetched and written per round trip
+PIPELINE_BATCH_SIZE = 32    # (text, label) pairs per forward pass; each bill is len(TOPIC_CATEGORIES) pairs
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", str(os.cpu_count() or 1)))
+
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+
+# ✅ Load classification model (on first use, for the configured backend).
+# transformers/torch are only imported here, so importing this module (as the
+# web app does) stays cheap until something actually needs a topic.
+classifier = None
+classifier_lock = threading.Lock()
+
+def load_classifier(backend=CLASSIFIER_BACKEND):
+    """Build a classifier for `backend`. Both backends share the zero-shot pipeline's call signature and output."""
+    if backend == "embedding":
+        from embedding_classifier import EmbeddingTopicClassifier
+        return EmbeddingTopicClassifier()
+    if backend != "zero-shot":
+        raise ValueError(f"Unknown CLASSIFIER_BACKEND: {backend}")
+    from transformers import pipeline
+    return pipeline("zero-shot-classification", model=ZERO_SHOT_MODEL)
+
+def get_classifier():
+    """Return the shared classifier, loading it exactly once even if many threads ask at the same time."""
+    global classifier
+    if classifier is None:
+        with classifier_lock:
+            if classifier is None:
+                start = time.perf_counter()
+                classifier = load_classifier()
+                print(f"🧠 Loaded {CLASSIFIER_BACKEND} classifier in {time.perf_counter() - start:.1f}s")
+    return classifier
 
 def classify_bills(batch_size=BATCH_SIZE, num_threads=NUM_THREADS):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    cursor = db.reader().cursor()
 
     cursor.execute("""
         SELECT COUNT(*) FROM bills WHERE topic IS NULL AND status IN ('4', '5', '6');
     """)
     total_bills = cursor.fetchone()[0]
-    conn.close()
 
     if total_bills == 0:
         print("✅ No bills to classify.")
@@ -32,16 +66,7 @@ def classify_bills(batch_size=BATCH_SIZE, num_threads=NUM_THREADS):
 
     with tqdm(total=total_bills, desc="Classifying Bills") as pbar:
         while True:
-            conn = sqlite3.connect(DB_FILE, timeout=10)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT bill_id, title, description, full_text FROM bills 
-                WHERE topic IS NULL AND status IN ('4', '5', '6') 
-                LIMIT ?;
-            """, (batch_size,))
-            bills = cursor.fetchall()
-            conn.close()
+            bills = fetch_unclassified(cursor, batch_size)
 
             if not bills:
                 break
@@ -54,38 +79,203 @@ def classify_bills(batch_size=BATCH_SIZE, num_threads=NUM_THREADS):
 
     print("✅ Classification complete.")
 
-def classify_and_update(bill):
-    conn = sqlite3.connect(DB_FILE, timeout=10)
-    cursor = conn.cursor()
+def build_input_text(title, description, full_text):
+    """Text fed to the classifier, or None when there is too little to classify."""
+    base_text = full_text if full_text and len(full_text.strip()) > 100 else description
+    if not base_text or len(base_text.strip()) < 20:
+        return None
+    return f"Title: {title}\n{base_text[:MAX_INPUT_CHARS]}"
 
+def topics_from_result(result, threshold=None):
+    """Turn one classifier result into (topic_str, score_json)."""
+    if threshold is None:
+        # Backends score on different scales; the embedding backend carries its own cut-off
+        threshold = getattr(classifier, "threshold", TOPIC_THRESHOLD)
+    topics = [label for label, score in zip(result["labels"], result["scores"]) if score > threshold]
+    if not topics:
+        topics = [result["labels"][0]]  # fallback to best match
+    return ", ".join(topics), json.dumps(dict(zip(result["labels"], result["scores"])))
+
+MISCELLANEOUS = ("Miscellaneous", json.dumps({"Miscellaneous": 1.0}))
+
+def classify_and_update(bill):
     bill_id, title, description, full_text = bill
-    base_text = full_text if full_text and len(full_text.strip()) > 100 else description
+    input_text = build_input_text(title, description, full_text)
 
-    if not base_text or len(base_text.strip()) < 20:
-        topic_str = "Miscellaneous"
-        score_json = json.dumps({"Miscellaneous": 1.0})
+    if not input_text:
+        topic_str, score_json = MISCELLANEOUS
     else:
-        input_text = f"Title: {title}\n{base_text[:MAX_INPUT_CHARS]}"
-
         try:
-            result = classifier(input_text, TOPIC_CATEGORIES, multi_label=True)
-            topics = [label for label, score in zip(result["labels"], result["scores"]) if score > 0.6]
-            if not topics:
-                topics = [result["labels"][0]]
-            topic_str = ", ".join(topics)
-            score_json = json.dumps(dict(zip(result["labels"], result["scores"])))
+            result = get_classifier()(input_text, TOPIC_CATEGORIES, multi_label=True)
+            topic_str, score_json = topics_from_result(result)
         except Exception as e:
             print(f"⚠️ Classification error for bill {bill_id}: {e}")
-            topic_str = "Miscellaneous"
-            score_json = json.dumps({"Miscellaneous": 1.0})
+            topic_str, score_json = MISCELLANEOUS
 
     try:
-        cursor.execute("UPDATE bills SET topic = ?, topic_scores = ? WHERE bill_id = ?", (topic_str, score_json, bill_id))
-        conn.commit()
+        # Threads' updates queue on the shared writer and are committed together
+        db.write(store_bill_topics, [(topic_str, score_json, bill_id)])
     except Exception as e:
         print(f"❌ DB update failed for bill {bill_id}: {e}")
-    finally:
-        conn.close()
+
+# ----------------------------
+# ⚡ Batched classification
+# ----------------------------
+def pin_torch_threads(num_threads=TORCH_THREADS):
+    """Give torch's intra-op pool every core once, instead of threads fighting over it."""
+    import torch
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # can only be set before torch starts any parallel work
+
+def classify_texts(texts, pipeline_batch_size=PIPELINE_BATCH_SIZE):
+    """Classify a list of input texts in one pipeline call. Returns [(topic_str, score_json), ...]."""
+    if not texts:
+        return []
+    results = get_classifier()(texts, TOPIC_CATEGORIES, multi_label=True, batch_size=pipeline_batch_size)
+    if isinstance(results, dict):
+        results = [results]
+    return [topics_from_result(result) for result in results]
+
+def classify_bill_rows(bills, pipeline_batch_size=PIPELINE_BATCH_SIZE):
+    """Classify (bill_id, title, description, full_text) rows. Returns [(topic_str, score_json, bill_id), ...]."""
+    updates = []
+    to_classify = []
+    for bill_id, title, description, full_text in bills:
+        input_text = build_input_text(title, description, full_text)
+        if input_text:
+            to_classify.append((bill_id, input_text))
+        else:
+            updates.append((*MISCELLANEOUS, bill_id))
+
+    try:
+        results = classify_texts([text for _, text in to_classify], pipeline_batch_size)
+    except Exception as e:
+        print(f"⚠️ Batch classification error, falling back to one at a time: {e}")
+        results = []
+        for bill_id, text in to_classify:
+            try:
+                results.extend(classify_texts([text], pipeline_batch_size))
+            except Exception as e:
+                print(f"⚠️ Classification error for bill {bill_id}: {e}")
+                results.append(MISCELLANEOUS)
+
+    updates.extend((topic_str, score_json, bill_id) for (bill_id, _), (topic_str, score_json) in zip(to_classify, results))
+    return updates
+
+def fetch_unclassified(cursor, limit):
+    cursor.execute("""
+        SELECT bills.bill_id, bills.title, bills.description, bill_texts.codec, bill_texts.text
+        FROM bills
+        LEFT JOIN bill_texts ON bill_texts.bill_id = bills.bill_id
+        WHERE bills.topic IS NULL AND bills.status IN ('4', '5', '6') 
+        LIMIT ?;
+    """, (limit,))
+    return [
+        (bill_id, title, description, decompress_text(blob, codec) if blob else None)
+        for bill_id, title, description, codec, blob in cursor.fetchall()
+    ]
+
+def classify_bills_batched(db_batch_size=DB_BATCH_SIZE, pipeline_batch_size=PIPELINE_BATCH_SIZE,
+                           num_threads=TORCH_THREADS):
+    """Classify unlabelled bills by handing whole lists of texts to the pipeline.
+
+    One process, torch threads pinned, no sleeps: each round reads
+    `db_batch_size` bills, runs them through the model `pipeline_batch_size`
+    (text, label) pairs per forward pass and writes every result with a single
+    executemany().
+    """
+    pin_torch_threads(num_threads)
+
+    cursor = db.reader().cursor()
+
+    cursor.execute("""
+        SELECT COUNT(*) FROM bills WHERE topic IS NULL AND status IN ('4', '5', '6');
+    """)
+    total_bills = cursor.fetchone()[0]
+
+    if total_bills == 0:
+        print("✅ No bills to classify.")
+        return
+
+    print(f"🔍 Total bills to classify: {total_bills}")
+    start = time.perf_counter()
+    done = 0
+
+    with tqdm(total=total_bills, desc="Classifying Bills") as pbar:
+        while True:
+            bills = fetch_unclassified(cursor, db_batch_size)
+            if not bills:
+                break
+
+            updates = classify_bill_rows(bills, pipeline_batch_size)
+            db.write(store_bill_topics, updates)
+
+            done += len(bills)
+            pbar.update(len(bills))
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Classification complete: {done} bills in {elapsed:.1f}s ({done / elapsed:.2f} bills/sec).")
+
+def benchmark_classification(sample_size=64, pipeline_batch_sizes=(1, 8, 32, 64), num_threads=TORCH_THREADS):
+    """Measure CPU throughput (bills/sec) of the threaded path vs. batched pipeline calls.
+
+    Uses already-fetched bill texts and writes nothing back to the database.
+    """
+    pin_torch_threads(num_threads)
+
+    cursor = db.reader().cursor()
+    cursor.execute("""
+        SELECT bills.title, bills.description, bill_texts.codec, bill_texts.text
+        FROM bills
+        LEFT JOIN bill_texts ON bill_texts.bill_id = bills.bill_id
+        WHERE bills.status IN (4, 5, 6)
+        ORDER BY bills.status_date DESC
+        LIMIT ?
+    """, (sample_size * 4,))
+    texts = [
+        build_input_text(title, description, decompress_text(blob, codec) if blob else None)
+        for title, description, codec, blob in cursor.fetchall()
+    ]
+    texts = [text for text in texts if text][:sample_size]
+
+    if not texts:
+        print("❌ No bills with text to benchmark.")
+        return
+
+    print(f"⏱️ Benchmarking {len(texts)} bills x {len(TOPIC_CATEGORIES)} labels on {num_threads} torch threads")
+
+    classifier = get_classifier()
+    classifier(texts[0], TOPIC_CATEGORIES, multi_label=True)  # warm-up
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
+        list(executor.map(lambda text: classifier(text, TOPIC_CATEGORIES, multi_label=True), texts))
+    elapsed = time.perf_counter() - start
+    print(f"   threaded ({NUM_THREADS} threads, one text per call): {len(texts) / elapsed:.2f} bills/sec")
+
+    for pipeline_batch_size in pipeline_batch_sizes:
+        start = time.perf_counter()
+        classify_texts(texts, pipeline_batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"   batched (batch_size={pipeline_batch_size}): {len(texts) / elapsed:.2f} bills/sec")
 
 if __name__ == "__main__":
-    classify_bills()
+    parser = argparse.ArgumentParser(description="Classify bills into TOPIC_CATEGORIES.")
+    parser.add_argument("--mode", choices=["batched", "threaded"], default="batched",
+                        help="batched: list inputs to the pipeline with an explicit batch_size (default); "
+                             "threaded: the original one-text-per-thread loop")
+    parser.add_argument("--batch-size", type=int, default=PIPELINE_BATCH_SIZE,
+                        help="(text, label) pairs per pipeline forward pass")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="report bills/sec for each mode without writing to the database")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_classification()
+    elif args.mode == "threaded":
+        classify_bills()
+    else:
+        classify_bills_batched(pipeline_batch_size=args.batch_size)
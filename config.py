@@ -24,6 +24,19 @@ DB_FILE = os.getenv(
     os.path.join(DATA_DIR, "legislation.db")
 )
 
+# Read-only snapshot mode (see snapshot.py). `python snapshot.py` publishes
+# immutable copies of DB_FILE into SNAPSHOT_DIR; processes started with
+# USE_SNAPSHOT=1 (the web app and summary workers) read the current snapshot
+# and write summaries, topics and caches to OVERLAY_DB_FILE instead.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+OVERLAY_DB_FILE = os.getenv("OVERLAY_DB_FILE", os.path.join(DATA_DIR, "overlay.db"))
+USE_SNAPSHOT = os.getenv("USE_SNAPSHOT") == "1"
+
+# Topic classifier backend: "zero-shot" (facebook/bart-large-mnli, one forward pass
+# per bill/label pair) or "embedding" (one small sentence-embedding pass per bill,
+# compared against cached label embeddings; see embedding_classifier.py)
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "zero-shot")
+
 TOPIC_CATEGORIES = [
     "Healthcare", "Education", "Economy", "National Security", "Infrastructure",
     "Criminal Justice", "Social Issues", "Environment", "International Relations",
@@ -0,0 +1,278 @@
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from urllib.parse import quote
+from concurrent.futures import Future
+from config import DB_FILE, SNAPSHOT_DIR, OVERLAY_DB_FILE, USE_SNAPSHOT
+
+# ----------------------------
+# 🗄️ Shared SQLite access
+# ----------------------------
+# The database runs in WAL mode, so readers never wait for the writer and the
+# writer never waits for readers. Each thread reuses one read connection
+# (query_only, memory-mapped) instead of opening and closing one per call.
+# Within a process, every write goes to a single writer connection on its own
+# thread, which runs whatever writes are queued in one transaction and commits
+# them together. Different processes (web workers, summary workers,
+# classify.py) still take turns on SQLite's write lock, waiting up to
+# BUSY_TIMEOUT_SECONDS instead of failing with "database is locked".
+# With USE_SNAPSHOT=1, reads come from a published immutable snapshot and
+# writes land in a small overlay database (see below).
+BUSY_TIMEOUT_SECONDS = 30
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+WRITE_BATCH_MAX = 64           # queued writes committed in one transaction
+
+def connect(path=DB_FILE, **kwargs):
+    """A connection in WAL mode with a busy timeout, for scripts that need their own (the bulk loaders)."""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, **kwargs)
+    conn.execute("PRAGMA journal_mode = WAL")    # persistent; a no-op once the file is in WAL mode
+    conn.execute("PRAGMA synchronous = NORMAL")  # safe with WAL: only the last commits can be lost on power failure
+    return conn
+
+# ----------------------------
+# 📸 Read-only snapshot mode
+# ----------------------------
+# A connection's main database is the writable overlay (OVERLAY_DB_FILE) and
+# the snapshot that SNAPSHOT_DIR/CURRENT names is attached as "snapshot".
+# Opened immutable, SQLite takes no locks on it and never checks it for
+# changes, and every process maps the same file, so they all share one copy in
+# the OS page cache. Temp views named bills and bill_topics lay the overlay's
+# summaries and topics over the snapshot's rows, and INSTEAD OF triggers turn
+# the usual UPDATE bills / bill_topics writes into overlay writes, so callers
+# run the same SQL in both modes. Tables only the snapshot has (people, votes,
+# bill_texts, ...) resolve to it by name; the overlay's own tables
+# (summary_jobs, caches, leases) come first. snapshot.py publishes snapshots
+# and creates the overlay.
+SNAPSHOT_POINTER = "CURRENT"
+SNAPSHOT_MMAP_SIZE = int(os.getenv("SNAPSHOT_MMAP_SIZE", str(8 * 1024 ** 3)))  # SQLite caps it at its build limit
+SNAPSHOT_CHECK_SECONDS = 2     # how often connections look for a newly published snapshot
+OVERRIDE_COLUMNS = ("summary", "topic", "topic_scores")   # bills columns the overlay can change
+
+snapshot_path = None
+snapshot_checked_at = 0.0
+
+def published_snapshot():
+    """Path of the snapshot SNAPSHOT_DIR/CURRENT points at, or None if none has been published."""
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, SNAPSHOT_POINTER)) as f:
+            return os.path.join(SNAPSHOT_DIR, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+def current_snapshot():
+    """The snapshot this process should read (re-checked every SNAPSHOT_CHECK_SECONDS), or None outside snapshot mode."""
+    global snapshot_path, snapshot_checked_at
+    if not USE_SNAPSHOT:
+        return None
+    now = time.monotonic()
+    if snapshot_path is None or now - snapshot_checked_at >= SNAPSHOT_CHECK_SECONDS:
+        path = published_snapshot()
+        if path is None:
+            raise RuntimeError(f"USE_SNAPSHOT=1 but no snapshot is published in {SNAPSHOT_DIR}; run snapshot.py first.")
+        snapshot_path, snapshot_checked_at = path, now
+    return snapshot_path
+
+def snapshot_uri(path):
+    return f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1"
+
+def open_snapshot(path):
+    """A plain read-only connection to one snapshot file, e.g. to check it before publishing."""
+    return sqlite3.connect(snapshot_uri(path), uri=True)
+
+def attach_snapshot(conn, path, for_reads=False):
+    conn.execute("ATTACH DATABASE ? AS snapshot", (snapshot_uri(path),))
+    conn.execute(f"PRAGMA snapshot.mmap_size = {SNAPSHOT_MMAP_SIZE}")
+    columns = [row[1] for row in conn.execute("PRAGMA snapshot.table_info(bills)")]
+    bill_columns = ", ".join(
+        f"COALESCE(o.{column}, b.{column}) AS {column}" if column in OVERRIDE_COLUMNS else f"b.{column}"
+        for column in columns
+    )
+    # Triggers can't name a schema, so the overlay tables have their own names.
+    # A bill_overrides column is NULL until an UPDATE sets it, and a non-NULL
+    # topic means the bill's topic rows come from bill_topic_overrides. Each
+    # trigger fires only for the columns in the UPDATE's SET, so a summary-only
+    # update leaves the snapshot's topics in place.
+    conn.executescript(f'''
+        CREATE TEMP VIEW bills AS
+            SELECT {bill_columns}
+            FROM snapshot.bills AS b LEFT JOIN main.bill_overrides AS o ON o.bill_id = b.bill_id;
+
+        CREATE TEMP TRIGGER bills_update_summary INSTEAD OF UPDATE OF summary ON bills BEGIN
+            INSERT INTO bill_overrides (bill_id, summary) VALUES (NEW.bill_id, NEW.summary)
+            ON CONFLICT (bill_id) DO UPDATE SET summary = excluded.summary;
+        END;
+
+        CREATE TEMP TRIGGER bills_update_topic INSTEAD OF UPDATE OF topic, topic_scores ON bills BEGIN
+            INSERT INTO bill_overrides (bill_id, topic, topic_scores) VALUES (NEW.bill_id, NEW.topic, NEW.topic_scores)
+            ON CONFLICT (bill_id) DO UPDATE SET topic = excluded.topic, topic_scores = excluded.topic_scores;
+        END;
+
+        CREATE TEMP VIEW bill_topics AS
+            SELECT bill_id, topic, score FROM main.bill_topic_overrides
+            UNION ALL
+            SELECT bill_id, topic, score FROM snapshot.bill_topics AS s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM main.bill_overrides AS o WHERE o.bill_id = s.bill_id AND o.topic IS NOT NULL
+            );
+
+        CREATE TEMP TRIGGER bill_topics_insert INSTEAD OF INSERT ON bill_topics BEGIN
+            INSERT OR REPLACE INTO bill_topic_overrides (bill_id, topic, score) VALUES (NEW.bill_id, NEW.topic, NEW.score);
+        END;
+
+        CREATE TEMP TRIGGER bill_topics_delete INSTEAD OF DELETE ON bill_topics BEGIN
+            DELETE FROM bill_topic_overrides WHERE bill_id = OLD.bill_id AND topic = OLD.topic;
+        END;
+    ''')
+    if for_reads:
+        # Readers see both counters added up, so publishing a snapshot (which
+        # bumps the source database's) also tells topic indexes to rebuild.
+        # The writer bumps the overlay's own row.
+        conn.execute('''
+            CREATE TEMP VIEW data_versions AS
+                SELECT name, SUM(version) AS version FROM (
+                    SELECT name, version FROM main.data_versions
+                    UNION ALL
+                    SELECT name, version FROM snapshot.data_versions
+                )
+                GROUP BY name
+        ''')
+
+def open_connection(snapshot, path=DB_FILE, for_reads=False, **kwargs):
+    """connect() to `path`, or to the overlay with `snapshot` attached when one is given."""
+    if snapshot is None:
+        return connect(path, **kwargs)
+    conn = connect(f"file:{quote(os.path.abspath(OVERLAY_DB_FILE))}", uri=True, **kwargs)
+    attach_snapshot(conn, snapshot, for_reads)
+    return conn
+
+# ----------------------------
+# 📖 Per-thread read connections
+# ----------------------------
+local = threading.local()
+
+def reader():
+    """This thread's read-only connection, opened on first use and kept for the thread's lifetime.
+
+    In snapshot mode it is reopened once a new snapshot is published.
+    """
+    conn = getattr(local, "reader", None)
+    snapshot = current_snapshot()
+    # A connection must not cross a fork (gunicorn workers), so open a fresh one per process
+    if conn is None or local.reader_pid != os.getpid() or local.reader_snapshot != snapshot:
+        # Autocommit, so a stray DML statement can't leave an implicit BEGIN holding an old snapshot.
+        # A connection replaced by a newer snapshot's isn't closed here: cursors handed out
+        # before the swap may still be reading from it, and it closes once they're gone.
+        conn = open_connection(snapshot, for_reads=True, isolation_level=None)
+        conn.execute("PRAGMA query_only = ON")
+        # main only: an unqualified mmap_size would also reset the snapshot's larger one
+        conn.execute(f"PRAGMA main.mmap_size = {MMAP_SIZE}")
+        local.reader, local.reader_pid, local.reader_snapshot = conn, os.getpid(), snapshot
+    return conn
+
+# ----------------------------
+# ✍️ Single serialized writer
+# ----------------------------
+class Writer:
+    """Runs write jobs on one connection and thread, committing queued jobs as one transaction.
+
+    A job is fn(cursor, *args). Each runs inside its own SAVEPOINT, so a job
+    that raises is rolled back on its own and its caller gets the exception,
+    while the rest of the batch still commits. Jobs must not commit or roll
+    back themselves.
+    """
+
+    def __init__(self, path=DB_FILE, max_batch=WRITE_BATCH_MAX):
+        self.path = path
+        self.max_batch = max_batch
+        self.pid = os.getpid()
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="sqlite-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args):
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("Write jobs can't queue more writes; call the function with the job's cursor instead.")
+        future = Future()
+        self.jobs.put((future, fn, args))
+        return future
+
+    def run(self):
+        conn, snapshot = None, None
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                # (Re)open on first use and whenever a new snapshot is published
+                if conn is None or current_snapshot() != snapshot:
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                    snapshot = current_snapshot()
+                    # isolation_level=None: this thread issues BEGIN / SAVEPOINT / COMMIT itself
+                    conn = open_connection(snapshot, self.path, isolation_level=None, check_same_thread=False)
+            except (sqlite3.Error, RuntimeError) as e:
+                logging.error(f"❌ Can't open the writer connection: {e}")
+                for future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.run_batch(conn, batch)
+
+    def run_batch(self, conn, batch):
+        cursor = conn.cursor()
+        outcomes = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for future, fn, args in batch:
+                cursor.execute("SAVEPOINT job")
+                try:
+                    result = fn(cursor, *args)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO job")
+                    outcomes.append((future, None, e))
+                else:
+                    outcomes.append((future, result, None))
+                cursor.execute("RELEASE job")
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            logging.error(f"❌ Write batch of {len(batch)} jobs failed: {e}")
+            for future, _, _ in batch:
+                future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+writer_instance = None
+writer_lock = threading.Lock()
+
+def get_writer():
+    global writer_instance
+    with writer_lock:
+        # The writer thread doesn't survive a fork; start a new one in the child
+        if writer_instance is None or writer_instance.pid != os.getpid():
+            writer_instance = Writer()
+        return writer_instance
+
+def write_async(fn, *args):
+    """Queue fn(cursor, *args) on the writer. Returns a Future that resolves once it is committed."""
+    return get_writer().submit(fn, *args)
+
+def write(fn, *args):
+    """Run fn(cursor, *args) on the writer and return its result once committed."""
+    return write_async(fn, *args).result()
+
+def execute(sql, params=()):
+    """Run one write statement through the writer. Returns the number of rows it changed."""
+    return write(lambda cursor: cursor.execute(sql, params).rowcount)
@@ -0,0 +1,145 @@
+import os
+import json
+import random
+import time
+import argparse
+import db
+from config import TOPIC_CATEGORIES
+from bill_texts import decompress_text
+
+# ✅ Embedding backend config
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_THRESHOLD = float(os.getenv("EMBEDDING_THRESHOLD", "0.3"))   # cosine similarity cut-off
+EMBEDDING_MAX_TOKENS = 256
+EMBEDDING_BATCH_SIZE = 32
+LABEL_TEMPLATE = "This bill is about {}."
+
+class EmbeddingTopicClassifier:
+    """Topic classifier that embeds each bill once and compares it to cached label embeddings.
+
+    Zero-shot NLI needs one full forward pass per (text, label) pair; here each
+    text costs one pass of a small encoder and scoring all labels is a single
+    matrix multiply. Calls and results mirror the zero-shot pipeline, so
+    classify.py can swap backends through CLASSIFIER_BACKEND. Scores are cosine
+    similarities, so `threshold` replaces the pipeline's 0.6 probability cut-off.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, threshold=EMBEDDING_THRESHOLD):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.threshold = threshold
+        self.label_cache = {}
+
+    def embed(self, texts, batch_size=EMBEDDING_BATCH_SIZE):
+        """Mean-pooled, L2-normalised embeddings for a list of texts."""
+        torch = self.torch
+        batches = []
+        with torch.inference_mode():
+            for i in range(0, len(texts), batch_size):
+                encoded = self.tokenizer(
+                    texts[i:i + batch_size], padding=True, truncation=True,
+                    max_length=EMBEDDING_MAX_TOKENS, return_tensors="pt"
+                )
+                hidden = self.model(**encoded).last_hidden_state
+                mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                batches.append(torch.nn.functional.normalize(pooled, dim=1))
+        return torch.cat(batches)
+
+    def label_embeddings(self, labels):
+        key = tuple(labels)
+        if key not in self.label_cache:
+            self.label_cache[key] = self.embed([LABEL_TEMPLATE.format(label) for label in labels])
+        return self.label_cache[key]
+
+    def __call__(self, texts, labels, multi_label=True, batch_size=EMBEDDING_BATCH_SIZE):
+        single = isinstance(texts, str)
+        text_list = [texts] if single else list(texts)
+
+        similarities = self.embed(text_list, batch_size) @ self.label_embeddings(labels).T
+
+        results = []
+        for text, row in zip(text_list, similarities.tolist()):
+            ranked = sorted(zip(labels, row), key=lambda pair: pair[1], reverse=True)
+            results.append({
+                "sequence": text,
+                "labels": [label for label, _ in ranked],
+                "scores": [score for _, score in ranked],
+            })
+        return results[0] if single else results
+
+# ----------------------------
+# 📊 Agreement with the zero-shot (BART) labels
+# ----------------------------
+def load_labelled_sample(sample_size, seed):
+    """A reproducible random sample of bills that already carry stored topics."""
+    from classify import build_input_text
+
+    cursor = db.reader().cursor()
+    cursor.execute("""
+        SELECT bills.bill_id, bills.title, bills.description, bills.topic, bills.topic_scores,
+               bill_texts.codec, bill_texts.text
+        FROM bills
+        LEFT JOIN bill_texts ON bill_texts.bill_id = bills.bill_id
+        WHERE bills.topic IS NOT NULL AND bills.topic_scores IS NOT NULL
+    """)
+    rows = cursor.fetchall()
+
+    sample = []
+    for bill_id, title, description, topic, topic_scores, codec, blob in rows:
+        scores = json.loads(topic_scores)
+        # Skip rows that never went through the model (too little text, or errors)
+        if scores == {"Miscellaneous": 1.0}:
+            continue
+        input_text = build_input_text(title, description, decompress_text(blob, codec) if blob else None)
+        if input_text:
+            stored_top1 = max(scores, key=scores.get)
+            sample.append((bill_id, input_text, {t.strip() for t in topic.split(",")}, stored_top1))
+
+    random.Random(seed).shuffle(sample)
+    return sample[:sample_size]
+
+def agreement_report(sample_size=200, seed=42, thresholds=(0.2, 0.25, 0.3, 0.35, 0.4)):
+    """Compare the embedding backend against the stored zero-shot topics on a held-out sample.
+
+    Reports, per cosine threshold: how often the embedding top-1 label is one of
+    the stored topics, how often the stored top-1 label lands in the embedding
+    top 3, and the mean Jaccard overlap of the two topic sets. Run it before
+    switching CLASSIFIER_BACKEND, while bills.topic still holds BART output.
+    """
+    sample = load_labelled_sample(sample_size, seed)
+    if not sample:
+        print("❌ No zero-shot-labelled bills to compare against.")
+        return
+
+    classifier = EmbeddingTopicClassifier()
+    start = time.perf_counter()
+    results = classifier([text for _, text, _, _ in sample], TOPIC_CATEGORIES)
+    elapsed = time.perf_counter() - start
+
+    print(f"📊 Embedding ({EMBEDDING_MODEL}) vs. stored zero-shot topics on {len(sample)} bills")
+    print(f"⏱️ {len(sample) / elapsed:.1f} bills/sec on CPU")
+
+    top1_hits = sum(result["labels"][0] in expected for (_, _, expected, _), result in zip(sample, results))
+    top3_hits = sum(stored_top1 in result["labels"][:3] for (_, _, _, stored_top1), result in zip(sample, results))
+    print(f"🎯 Embedding top-1 in stored topics: {top1_hits / len(sample):.1%}")
+    print(f"🎯 Stored top-1 in embedding top-3: {top3_hits / len(sample):.1%}")
+
+    for threshold in thresholds:
+        jaccards = []
+        for (_, _, expected, _), result in zip(sample, results):
+            predicted = {label for label, score in zip(result["labels"], result["scores"]) if score > threshold}
+            predicted = predicted or {result["labels"][0]}
+            jaccards.append(len(predicted & expected) / len(predicted | expected))
+        print(f"   threshold {threshold:.2f}: mean Jaccard {sum(jaccards) / len(jaccards):.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agreement report: embedding backend vs. stored zero-shot topics.")
+    parser.add_argument("--sample-size", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    agreement_report(sample_size=args.sample_size, seed=args.seed)
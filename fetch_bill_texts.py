@@ -1,12 +1,16 @@
 import os
-import sqlite3
 import requests
 import base64
-import tempfile
+import io
 import pdfplumber
+import random
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from tqdm import tqdm
-from config import DB_FILE
+import db
+from bill_texts import store_full_text, store_full_texts
+import http_client
 import logging
 
 # 🧹 Silence noisy PDF messages
@@ -14,8 +18,84 @@ logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
 
 LEGISCAN_API_KEY = os.getenv("LEGISCAN_API_KEY")
+# Point this at a local stub to exercise the fetcher without hitting LegiScan
+LEGISCAN_API_URL = os.getenv("LEGISCAN_API_URL", "https://api.legiscan.com/")
 SUCCESS_LOG = "fetched_bills.log"
 FAILURE_LOG = "failed_bills.log"
+METRICS_LOG = "extraction_metrics.log"   # bill_id, doc_id, bytes, pages, seconds per PDF
+
+# Fetch tuning
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))        # requests in flight
+FETCH_RATE_PER_SEC = float(os.getenv("FETCH_RATE_PER_SEC", "4"))    # sustained requests/sec
+FETCH_BURST = int(os.getenv("FETCH_BURST", "8"))                    # token bucket capacity
+FETCH_MAX_RETRIES = 5
+FETCH_BACKOFF_BASE = 1.0    # seconds; doubles per retry
+FETCH_BACKOFF_MAX = 60.0
+FETCH_TIMEOUT = (5, 60)     # connect, read
+WRITE_BATCH_SIZE = 50       # bill texts per UPDATE transaction
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))   # PDF parser processes
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ----------------------------------------
+# Rate limiting + retries
+# ----------------------------------------
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def retry_delay(attempt, response=None):
+    """Exponential backoff with jitter, honouring Retry-After when the server sends one."""
+    if response is not None and response.headers.get("Retry-After", "").isdigit():
+        return float(response.headers["Retry-After"])
+    return min(FETCH_BACKOFF_MAX, FETCH_BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random() / 2)
+
+def get_bill_text(doc_id, bucket=None, max_retries=FETCH_MAX_RETRIES):
+    """Call getBillText for one document, retrying 429/5xx and connection errors.
+
+    Goes through the shared "legiscan" session in http_client; retries stay here
+    so every attempt waits for a token from the bucket.
+    """
+    params = {"key": LEGISCAN_API_KEY, "op": "getBillText", "id": doc_id}
+
+    for attempt in range(max_retries + 1):
+        if bucket:
+            bucket.acquire()
+        try:
+            response = http_client.get("legiscan", LEGISCAN_API_URL, params=params, timeout=FETCH_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_delay(attempt)
+            logging.warning(f"⚠️ doc_id {doc_id}: {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+            delay = retry_delay(attempt, response)
+            logging.warning(f"⚠️ doc_id {doc_id}: HTTP {response.status_code}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        response.raise_for_status()
+        return response.json()
 
 # ----------------------------------------
 # Log Handling
@@ -30,39 +110,59 @@ def log_bill(filepath, bill_id):
     with open(filepath, "a") as f:
         f.write(f"{bill_id}\n")
 
+def log_extraction_metrics(bill_id, doc_id, size, pages, seconds):
+    with open(METRICS_LOG, "a") as f:
+        f.write(f"{bill_id}\t{doc_id}\t{size}\t{pages}\t{seconds:.3f}\n")
+
 # ----------------------------------------
 # Download + decode + extract PDF text
 # ----------------------------------------
-def fetch_and_extract_text_from_doc(doc_id):
-    url = f"https://api.legiscan.com/?key={LEGISCAN_API_KEY}&op=getBillText&id={doc_id}"
-
+def download_bill_document(doc_id, bucket=None):
+    """Fetch and base64-decode one bill document. Returns (mime, bytes) or None."""
     try:
-        response = requests.get(url)
-        data = response.json()
+        data = get_bill_text(doc_id, bucket)
+    except Exception as e:
+        print(f"⚠️ Error fetching doc_id {doc_id}: {e}")
+        return None
 
-        doc = data.get("text", {}).get("doc")
-        mime = data.get("text", {}).get("mime")
+    doc = data.get("text", {}).get("doc")
+    mime = data.get("text", {}).get("mime")
 
-        if not doc or not mime:
-            print("❌ No document or MIME type found.")
-            return None
+    if not doc or not mime:
+        print("❌ No document or MIME type found.")
+        return None
 
-        decoded = base64.b64decode(doc)
-        suffix = ".pdf" if "pdf" in mime else ".bin"
+    if "pdf" not in mime:
+        print(f"⚠️ Unsupported MIME type: {mime}")
+        return None
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(decoded)
-            temp_path = tmp.name
+    try:
+        return mime, base64.b64decode(doc, validate=True)
+    except (ValueError, TypeError) as e:   # binascii.Error is a ValueError
+        print(f"⚠️ Error decoding doc_id {doc_id}: {e}")
+        return None
+
+def extract_pdf_text(pdf_bytes):
+    """Parse a PDF held in memory. Returns (text, page_count, seconds).
 
-        if suffix == ".pdf":
-            with pdfplumber.open(temp_path) as pdf:
-                return "\n".join([page.extract_text() or "" for page in pdf.pages])
-        else:
-            print(f"⚠️ Unsupported MIME type: {mime}")
-            return None
+    CPU-bound, so the batch runner calls this in a process pool; it never
+    touches the filesystem.
+    """
+    start = time.perf_counter()
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        pages = [page.extract_text() or "" for page in pdf.pages]
+    return "\n".join(pages), len(pages), time.perf_counter() - start
 
+def fetch_and_extract_text_from_doc(doc_id, bucket=None):
+    document = download_bill_document(doc_id, bucket)
+    if not document:
+        return None
+
+    try:
+        text, _, _ = extract_pdf_text(document[1])
+        return text
     except Exception as e:
-        print(f"⚠️ Error fetching doc_id {doc_id}: {e}")
+        print(f"⚠️ Error extracting doc_id {doc_id}: {e}")
         return None
 
 # ----------------------------------------
@@ -75,15 +175,7 @@ def fetch_and_store_full_text(bill_id, doc_id):
         log_bill(FAILURE_LOG, bill_id)
         return False
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE bills 
-        SET full_text = ?
-        WHERE bill_id = ?
-    """, (text, bill_id))
-    conn.commit()
-    conn.close()
+    db.write(store_full_text, bill_id, text)
 
     log_bill(SUCCESS_LOG, bill_id)
     print(f"✅ Stored text for bill {bill_id}")
@@ -92,23 +184,54 @@ def fetch_and_store_full_text(bill_id, doc_id):
 # ----------------------------------------
 # Main batch runner
 # ----------------------------------------
-def batch_fetch_and_store_texts(batch_limit=1000):
+def flush_texts(pending):
+    """Write a batch of (bill_id, text) pairs in one transaction and log them as fetched."""
+    if not pending:
+        return
+    db.write(store_full_texts, list(pending))
+    for bill_id, _ in pending:
+        log_bill(SUCCESS_LOG, bill_id)
+    pending.clear()
+
+def report_slowest(metrics, limit=5):
+    if not metrics:
+        return
+    total_pages = sum(m[3] for m in metrics)
+    total_seconds = sum(m[4] for m in metrics)
+    print(f"📄 Extracted {len(metrics)} PDFs, {total_pages} pages in {total_seconds:.1f}s of parser time.")
+    for bill_id, doc_id, size, pages, seconds in sorted(metrics, key=lambda m: m[4], reverse=True)[:limit]:
+        print(f"   🐢 bill {bill_id} (doc {doc_id}): {pages} pages, {size / 1024:.0f} KB, {seconds:.2f}s")
+
+def batch_fetch_and_store_texts(batch_limit=1000, concurrency=FETCH_CONCURRENCY,
+                                rate_per_sec=FETCH_RATE_PER_SEC, burst=FETCH_BURST,
+                                write_batch_size=WRITE_BATCH_SIZE, extract_workers=EXTRACT_WORKERS):
+    """Fetch missing bill texts as a two-stage pipeline.
+
+    Stage 1 downloads documents `concurrency` at a time on threads sharing the
+    pooled "legiscan" session and a token bucket. Stage 2 parses each PDF from
+    memory in a process pool as soon as its download lands, so downloads keep
+    flowing while pages are parsed; at most `concurrency + extract_workers`
+    documents are in either stage at once. The calling thread queries through its
+    db.reader() connection and hands texts to the db writer in batches of
+    `write_batch_size`.
+    Per-document parse time and page count go to METRICS_LOG.
+    """
     completed = load_logged_ids(SUCCESS_LOG)
     failed = load_logged_ids(FAILURE_LOG)
 
-    while True:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+    http_client.configure("legiscan", pool_size=concurrency)
+    bucket = TokenBucket(rate_per_sec, burst)
+    cursor = db.reader().cursor()
 
+    while True:
         cursor.execute("""
             SELECT bill_id, doc_id 
             FROM bills 
             WHERE status IN (4, 5, 6)
               AND doc_id IS NOT NULL 
-              AND full_text IS NULL
+              AND NOT EXISTS (SELECT 1 FROM bill_texts WHERE bill_texts.bill_id = bills.bill_id)
         """)
         all_bills = cursor.fetchall()
-        conn.close()
 
         bills_to_process = [
             (bid, did) for (bid, did) in all_bills
@@ -121,15 +244,70 @@ def batch_fetch_and_store_texts(batch_limit=1000):
 
         print(f"\n📦 Processing {len(bills_to_process)} more bills...")
 
-        for bill_id, doc_id in tqdm(bills_to_process, desc="📚 Fetching bill texts", unit="bill"):
-            try:
-                fetch_and_store_full_text(bill_id, doc_id)
-                completed.add(str(bill_id))  # Track in memory to avoid rechecking logs
-            except Exception as e:
-                print(f"❌ Error processing bill {bill_id}: {e}")
-                log_bill(FAILURE_LOG, bill_id)
-            time.sleep(1)
+        pending = []
+        metrics = []
+
+        def record_failure(bill_id):
+            print(f"❌ Skipped bill {bill_id} (no text)")
+            log_bill(FAILURE_LOG, bill_id)
+            failed.add(str(bill_id))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as downloader, \
+                ProcessPoolExecutor(max_workers=extract_workers) as extractor, \
+                tqdm(total=len(bills_to_process), desc="📚 Fetching bill texts", unit="bill") as pbar:
+            # future -> (stage, bill_id, doc_id, document size). Only `window`
+            # documents are downloading or parsing at once, so a large batch
+            # doesn't hold every decoded PDF in memory while the parsers catch up.
+            in_flight = {}
+            queued = iter(bills_to_process)
+            window = concurrency + extract_workers
+
+            def submit_downloads():
+                for bill_id, doc_id in queued:
+                    in_flight[downloader.submit(download_bill_document, doc_id, bucket)] = ("download", bill_id, doc_id, 0)
+                    if len(in_flight) >= window:
+                        return
+
+            submit_downloads()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, bill_id, doc_id, size = in_flight.pop(future)
+
+                    if stage == "download":
+                        document = future.result()
+                        if document:
+                            _, pdf_bytes = document
+                            in_flight[extractor.submit(extract_pdf_text, pdf_bytes)] = ("extract", bill_id, doc_id, len(pdf_bytes))
+                        else:
+                            record_failure(bill_id)
+                            pbar.update(1)
+                        continue
+
+                    pbar.update(1)
+                    try:
+                        text, pages, seconds = future.result()
+                    except Exception as e:
+                        print(f"⚠️ Error extracting doc_id {doc_id}: {e}")
+                        text = None
+                    else:
+                        metrics.append((bill_id, doc_id, size, pages, seconds))
+                        log_extraction_metrics(bill_id, doc_id, size, pages, seconds)
+
+                    if text:
+                        pending.append((bill_id, text))
+                        completed.add(str(bill_id))  # Track in memory to avoid rechecking logs
+                        if len(pending) >= write_batch_size:
+                            flush_texts(pending)
+                    else:
+                        record_failure(bill_id)
+                submit_downloads()
+
+        flush_texts(pending)
+        report_slowest(metrics)
+        http_client.log_latency_report("legiscan")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     batch_fetch_and_store_texts()
@@ -0,0 +1,97 @@
+import time
+import logging
+
+# ----------------------------
+# 🗳️ Materialized legislator final votes
+# ----------------------------
+# One row per (legislator, bill with a final status): how the legislator voted
+# on the bill's most recent roll call they took part in, plus the bill's vote
+# totals. The web tier reads a legislator's latest bills straight off
+# idx_final_votes_recent instead of joining and aggregating legislator_votes,
+# votes and bills on every request. The loaders in initialize_database.py
+# refresh it: fully after a bulk load, per touched bill after an incremental one.
+FINAL_STATUSES = (4, 5, 6)     # passed, vetoed, failed
+
+# vote_text comes from the legislator's latest roll call on the bill; date and
+# totals keep the MAX() aggregates the API has always reported.
+FINAL_VOTES_SELECT = f'''
+    SELECT people_id, bill_id, vote_text, last_vote_date, yea, nay, passed, status_date FROM (
+        SELECT
+            legislator_votes.people_id,
+            bills.bill_id,
+            legislator_votes.vote_text,
+            bills.status_date,
+            ROW_NUMBER() OVER latest AS vote_rank,
+            MAX(votes.date) OVER per_bill AS last_vote_date,
+            MAX(votes.yea) OVER per_bill AS yea,
+            MAX(votes.nay) OVER per_bill AS nay,
+            MAX(votes.passed) OVER per_bill AS passed
+        FROM legislator_votes
+        JOIN votes ON legislator_votes.roll_call_id = votes.roll_call_id
+        JOIN bills ON votes.bill_id = bills.bill_id
+        WHERE bills.status IN ({", ".join(map(str, FINAL_STATUSES))}) {{bill_filter}}
+        WINDOW per_bill AS (PARTITION BY legislator_votes.people_id, bills.bill_id),
+               latest AS (PARTITION BY legislator_votes.people_id, bills.bill_id
+                          ORDER BY votes.date DESC, votes.roll_call_id DESC)
+    )
+    WHERE vote_rank = 1
+'''
+
+INSERT_FINAL_VOTES = '''
+    INSERT INTO legislator_final_votes
+        (people_id, bill_id, vote_text, last_vote_date, yea, nay, passed, status_date)
+'''
+
+def refresh_final_votes(cursor, bill_ids=None):
+    """Recompute legislator_final_votes for the given bills, or for every bill if bill_ids is None.
+
+    A bill whose status left 4/5/6 just loses its rows. The caller commits.
+    """
+    start = time.perf_counter()
+    if bill_ids is None:
+        cursor.execute("DELETE FROM legislator_final_votes")
+        cursor.execute(INSERT_FINAL_VOTES + FINAL_VOTES_SELECT.format(bill_filter=""))
+    else:
+        bill_ids = list(bill_ids)
+        if not bill_ids:
+            return 0
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS final_vote_bills (bill_id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM final_vote_bills")
+        cursor.executemany("INSERT OR IGNORE INTO final_vote_bills (bill_id) VALUES (?)", [(b,) for b in bill_ids])
+        cursor.execute("DELETE FROM legislator_final_votes WHERE bill_id IN (SELECT bill_id FROM final_vote_bills)")
+        cursor.execute(INSERT_FINAL_VOTES + FINAL_VOTES_SELECT.format(
+            bill_filter="AND bills.bill_id IN (SELECT bill_id FROM final_vote_bills)"
+        ))
+
+    rows = cursor.rowcount
+    scope = "all bills" if bill_ids is None else f"{len(bill_ids):,} bills"
+    logging.info(f"🗳️ Refreshed {rows:,} legislator final votes for {scope} in {time.perf_counter() - start:.2f}s")
+    return rows
+
+def backfill_final_votes(conn):
+    """Build legislator_final_votes for databases loaded before it existed."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM legislator_final_votes)")
+    if cursor.fetchone()[0]:
+        return
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM legislator_votes)")
+    if not cursor.fetchone()[0]:
+        return
+    refresh_final_votes(cursor)
+    conn.commit()
+
+def recent_final_votes_query(people_count, limit, bill_filter=""):
+    """Each legislator's `limit` most recent final-vote bills, one index range read per legislator.
+
+    Takes one people_id parameter per legislator (then any bill_filter params,
+    repeated per legislator). The caller orders the combined rows.
+    """
+    branch = f'''
+        SELECT * FROM (
+            SELECT people_id, bill_id, vote_text, last_vote_date, yea, nay, passed, status_date
+            FROM legislator_final_votes
+            WHERE people_id = ? {bill_filter}
+            ORDER BY status_date DESC, bill_id DESC
+            LIMIT {limit}
+        )'''
+    return " UNION ALL ".join([branch] * people_count)
@@ -0,0 +1,131 @@
+import time
+import bisect
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ----------------------------
+# 🌐 Shared HTTP client for outbound API calls
+# ----------------------------
+# One keep-alive session per upstream, so calls reuse TCP/TLS connections and a
+# slow upstream can only exhaust its own pool. Every request gets a (connect,
+# read) timeout and idempotent GETs are retried on connection errors and
+# 429/5xx, honouring Retry-After. Latency is recorded per upstream.
+UPSTREAMS = {
+    "geocode":   {"pool_size": 10, "timeout": (3.05, 10), "retries": 2},
+    "fivecalls": {"pool_size": 10, "timeout": (3.05, 10), "retries": 2},
+    "newsapi":   {"pool_size": 10, "timeout": (3.05, 10), "retries": 1},
+    # fetch_bill_texts.py paces and retries LegiScan itself, behind its token bucket
+    "legiscan":  {"pool_size": 8,  "timeout": (5, 60),    "retries": 0},
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF_FACTOR = 0.5
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+def make_session(pool_size, retries):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session(upstream):
+    with sessions_lock:
+        if upstream not in sessions:
+            settings = UPSTREAMS[upstream]
+            sessions[upstream] = make_session(settings["pool_size"], settings["retries"])
+        return sessions[upstream]
+
+def configure(upstream, **settings):
+    """Override an upstream's pool_size / timeout / retries; its session is rebuilt on next use."""
+    with sessions_lock:
+        UPSTREAMS[upstream] = {**UPSTREAMS[upstream], **settings}
+        old = sessions.pop(upstream, None)
+    if old:
+        old.close()
+
+def get(upstream, url, **kwargs):
+    """GET through the upstream's pooled session, with its default timeout unless one is passed."""
+    kwargs.setdefault("timeout", UPSTREAMS[upstream]["timeout"])
+    start = time.perf_counter()
+    error = True
+    try:
+        response = get_session(upstream).get(url, **kwargs)
+        error = response.status_code >= 500 or response.status_code == 429
+        return response
+    finally:
+        record_latency(upstream, (time.perf_counter() - start) * 1000, error)
+
+# ----------------------------
+# 📈 Per-upstream latency histograms
+# ----------------------------
+histograms = {}
+histograms_lock = threading.Lock()
+
+def record_latency(upstream, elapsed_ms, error=False):
+    with histograms_lock:
+        histogram = histograms.setdefault(upstream, {
+            "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "buckets": [0] * len(LATENCY_BUCKETS_MS)
+        })
+        histogram["count"] += 1
+        histogram["errors"] += error
+        histogram["total_ms"] += elapsed_ms
+        histogram["max_ms"] = max(histogram["max_ms"], elapsed_ms)
+        histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+def bucket_percentile(buckets, count, fraction, max_ms):
+    """Upper bound of the bucket holding the given fraction of requests (never above the slowest one)."""
+    target = fraction * count
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS_MS, buckets):
+        seen += n
+        if seen >= target:
+            return round(min(bound, max_ms), 1)
+    return round(max_ms, 1)
+
+def latency_stats():
+    """{upstream: {count, errors, mean_ms, max_ms, p50_ms, p95_ms, p99_ms, buckets}} for this process."""
+    with histograms_lock:
+        snapshot = {name: {**h, "buckets": list(h["buckets"])} for name, h in histograms.items()}
+
+    stats = {}
+    for upstream, h in snapshot.items():
+        count = h["count"]
+        stats[upstream] = {
+            "count": count,
+            "errors": h["errors"],
+            "mean_ms": round(h["total_ms"] / count, 1) if count else 0,
+            "max_ms": round(h["max_ms"], 1),
+            "p50_ms": bucket_percentile(h["buckets"], count, 0.50, h["max_ms"]),
+            "p95_ms": bucket_percentile(h["buckets"], count, 0.95, h["max_ms"]),
+            "p99_ms": bucket_percentile(h["buckets"], count, 0.99, h["max_ms"]),
+            "buckets": {("+Inf" if bound == float("inf") else f"le_{bound}"): n for bound, n in zip(LATENCY_BUCKETS_MS, h["buckets"])},
+        }
+    return stats
+
+def log_latency_report(*upstreams):
+    """Log a one-line latency summary per upstream (all of them if none are named)."""
+    for upstream, s in latency_stats().items():
+        if upstreams and upstream not in upstreams:
+            continue
+        logging.info(
+            f"🌐 {upstream}: {s['count']} requests, {s['errors']} errors, "
+            f"mean {s['mean_ms']}ms, p50 ≤{s['p50_ms']}ms, p95 ≤{s['p95_ms']}ms, max {s['max_ms']}ms"
+        )
@@ -1,18 +1,83 @@
-import sqlite3
 import json
-import glob
 import os
+import time
 import logging
+import sqlite3
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from config import DATA_DIR, DB_FILE
+import db
+from config import DATA_DIR
+from bill_texts import migrate_inline_texts
+from bill_topics import backfill_bill_topics, bump_data_version
+from final_votes import refresh_final_votes, backfill_final_votes, recent_final_votes_query
 
 load_dotenv()
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
+# Secondary indexes for the hot read paths in app.py. The legislator_votes index
+# carries vote_text so per-legislator vote lookups never have to touch the table
+# rows; idx_final_votes_recent serves each rep's latest bills (see final_votes.py).
+INDEXES = {
+    "idx_legislator_votes_people": "legislator_votes(people_id, roll_call_id, vote_text)",
+    "idx_votes_bill_date": "votes(bill_id, date)",
+    "idx_bills_status_date": "bills(status, status_date)",
+    "idx_people_bioguide": "people(bioguide_id)",
+    "idx_final_votes_recent": "legislator_final_votes(people_id, status_date DESC, bill_id DESC)",
+    "idx_final_votes_bill": "legislator_final_votes(bill_id)",
+}
+
+# One vote per legislator per roll call. Unlike INDEXES this is a constraint, so
+# the bulk loaders keep it in place; it is what lets re-imports upsert votes.
+UNIQUE_INDEXES = {
+    "idx_legislator_votes_roll_call": "legislator_votes(roll_call_id, people_id)",
+}
+
+# Bulk-load settings: rows per executemany() call and connection PRAGMAs that
+# trade crash safety for speed while a rebuild is running.
+BULK_BATCH_SIZE = 5000
+PARSE_CHUNK_FILES = 200    # JSON files handed to a parser process per task
+BULK_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": -1048576,   # negative = KiB, so ~1 GB of page cache
+    "temp_store": "MEMORY",
+}
+
+# Queries the web tier runs on every request. check_query_plans() refuses to
+# pass if SQLite would answer any of these with a full table scan.
+HOT_QUERIES = {
+    "people_by_bioguide": (
+        "SELECT bioguide_id, people_id, name, party, district FROM people WHERE bioguide_id IN (?, ?, ?)",
+        ("X000000", "X000001", "X000002")
+    ),
+    "legislation_for_reps": (f"""
+        SELECT recent.*, bills.title, bills.summary
+        FROM ({recent_final_votes_query(3, 2, "AND bill_id IN (SELECT bill_id FROM bill_topics WHERE topic IN (?))")}) AS recent
+        JOIN bills ON bills.bill_id = recent.bill_id
+    """, (0, "Healthcare", 1, "Healthcare", 2, "Healthcare")),
+    "bills_by_topics_all": ("""
+        SELECT bill_id, title FROM bills
+        WHERE bill_id IN (
+            SELECT bill_id FROM bill_topics WHERE topic IN (?, ?)
+            GROUP BY bill_id HAVING COUNT(*) = 2
+        )
+        ORDER BY status_date DESC LIMIT 10
+    """, ("Healthcare", "Taxes")),
+    "bills_missing_text": ("""
+        SELECT bill_id, doc_id
+        FROM bills
+        WHERE status IN (4, 5, 6)
+          AND doc_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM bill_texts WHERE bill_texts.bill_id = bills.bill_id)
+    """, ()),
+}
+
 def initialize_db():
-    conn = sqlite3.connect(DB_FILE)
+    conn = db.connect()
     cursor = conn.cursor()
 
     cursor.execute('''CREATE TABLE IF NOT EXISTS people (
@@ -39,7 +104,7 @@ def initialize_db():
             summary TEXT,             -- For AI summarization
             topic TEXT,               -- For AI topic classification
             topic_scores TEXT,        -- NEW: Raw JSON of confidence scores
-            full_text TEXT,           -- Full bill text
+            full_text TEXT,           -- Legacy: full texts now live compressed in bill_texts
             full_text_summary TEXT    -- AI summary of full text
         )
     ''')
@@ -67,102 +132,722 @@ def initialize_db():
         FOREIGN KEY(roll_call_id) REFERENCES votes(roll_call_id)
     )''')
 
+    # Extracted full texts, compressed and kept out of the bills rows (see bill_texts.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS bill_texts (
+        bill_id INTEGER PRIMARY KEY,
+        codec TEXT,
+        raw_size INTEGER,
+        compressed_size INTEGER,
+        text BLOB,
+        FOREIGN KEY(bill_id) REFERENCES bills(bill_id)
+    )''')
+
+    # One row per selected topic of a classified bill (see bill_topics.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS bill_topics (
+        bill_id INTEGER,
+        topic TEXT,
+        score REAL,               -- classifier score, NULL if unknown
+        PRIMARY KEY (bill_id, topic)
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bill_topics_topic ON bill_topics(topic, bill_id)")
+
+    # Each legislator's vote on every bill with a final status (see final_votes.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS legislator_final_votes (
+        people_id INTEGER,
+        bill_id INTEGER,
+        vote_text TEXT,           -- the legislator's vote on their latest roll call for the bill
+        last_vote_date TEXT,
+        yea INTEGER,
+        nay INTEGER,
+        passed INTEGER,
+        status_date TEXT,         -- copied from bills for the newest-first range read
+        PRIMARY KEY (people_id, bill_id)
+    )''')
+
+    # Change counters for derived in-memory data, e.g. the topic index (see bill_topics.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER
+    )''')
+
+    # Background summary jobs (see summary_queue.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS summary_jobs (
+        bill_id INTEGER PRIMARY KEY,
+        status TEXT,              -- pending, running, done, failed
+        vote_text TEXT,
+        outcome TEXT,
+        topic TEXT,
+        attempts INTEGER,
+        last_error TEXT,
+        available_at REAL,        -- unix time a pending job may next run
+        locked_until REAL,        -- lease expiry while running
+        created_at REAL,
+        updated_at REAL
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_summary_jobs_status ON summary_jobs(status, created_at)")
+
+    # Content-addressed cache of per-chunk GPT summaries, shared across bills (see chunk_cache.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS chunk_summaries (
+        key TEXT PRIMARY KEY,     -- sha256 of (model, prompt, normalized chunk)
+        summary TEXT,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        size INTEGER,             -- bytes counted against CHUNK_CACHE_MAX_BYTES
+        hits INTEGER,
+        created_at REAL,
+        last_used_at REAL
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunk_summaries_lru ON chunk_summaries(last_used_at)")
+    cursor.execute('''CREATE TABLE IF NOT EXISTS chunk_cache_stats (
+        counter TEXT PRIMARY KEY, -- hits, misses, saved_input_tokens, saved_output_tokens
+        value INTEGER
+    )''')
+
+    # Cross-process single-flight leases for per-bill work (see single_flight.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS flight_leases (
+        operation TEXT,           -- summary, classify
+        key TEXT,
+        owner TEXT,               -- host:pid:thread of the caller doing the work
+        expires_at REAL,
+        PRIMARY KEY (operation, key)
+    )''')
+
+    # Cached geocode / Five Calls responses shared by all web workers (see response_cache.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS api_cache (
+        namespace TEXT,
+        key TEXT,
+        value TEXT,               -- JSON
+        expires_at REAL,
+        PRIMARY KEY (namespace, key)
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_api_cache_expiry ON api_cache(namespace, expires_at)")
+
+    # Which version of each LegiScan session directory is loaded (from its hash.md5)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS dataset_sessions (
+        session_dir TEXT PRIMARY KEY,
+        hash TEXT,
+        loaded_at TEXT
+    )''')
+
+    # Size and mtime of every JSON file as of its last load, so a refresh can
+    # tell which files changed without re-reading them
+    cursor.execute('''CREATE TABLE IF NOT EXISTS dataset_files (
+        path TEXT PRIMARY KEY,
+        session_dir TEXT,
+        kind TEXT,
+        size INTEGER,
+        mtime_ns INTEGER
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dataset_files_session ON dataset_files(session_dir)")
+
+    create_unique_indexes(cursor)
+    create_indexes(cursor)
+
     conn.commit()
+    migrate_inline_texts(conn)
+    backfill_bill_topics(conn)
+    backfill_final_votes(conn)
     conn.close()
 
+def create_indexes(cursor):
+    for name, target in INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+def create_unique_indexes(cursor):
+    for name, target in UNIQUE_INDEXES.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+        if cursor.fetchone():
+            continue
+        if name == "idx_legislator_votes_roll_call":
+            # Databases loaded before this constraint existed may hold duplicate
+            # votes from repeated loads; keep the first copy of each.
+            cursor.execute('''
+                DELETE FROM legislator_votes WHERE id NOT IN (
+                    SELECT MIN(id) FROM legislator_votes GROUP BY roll_call_id, people_id
+                )''')
+            if cursor.rowcount:
+                logging.warning(f"🧹 Removed {cursor.rowcount} duplicate legislator votes.")
+        cursor.execute(f"CREATE UNIQUE INDEX {name} ON {target}")
+
+def drop_indexes(cursor):
+    for name in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+def check_query_plans(queries=HOT_QUERIES, path=None):
+    """Run EXPLAIN QUERY PLAN on the hot queries and raise if any of them scans a whole table.
+
+    Checks DB_FILE, or the published snapshot at `path` (see snapshot.py).
+    Raises RuntimeError if the database hasn't been initialized yet.
+    """
+    not_initialized = f"{path or db.DB_FILE} is missing the app's tables; run `python initialize_database.py` first."
+    if path is None and not os.path.exists(db.DB_FILE):
+        raise RuntimeError(not_initialized)   # db.connect() would create an empty database
+
+    conn = db.connect() if path is None else db.open_snapshot(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cursor.fetchall()}
+
+        full_scans = []
+        for label, (sql, params) in queries.items():
+            try:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            except sqlite3.OperationalError as e:
+                if "no such table" in str(e):
+                    raise RuntimeError(not_initialized) from e
+                raise
+            for _, _, _, detail in cursor.fetchall():
+                # "SCAN <table>" (before SQLite 3.36: "SCAN TABLE <table>") walks every
+                # row (or every index entry) of a real table. SEARCH steps, temp
+                # b-trees and scans of subquery results are fine.
+                words = detail.split()
+                if words[1:2] == ["TABLE"]:
+                    del words[1]
+                if words[0] == "SCAN" and len(words) > 1 and words[1] in tables:
+                    full_scans.append(f"{label}: {detail}")
+                else:
+                    logging.debug(f"{label}: {detail}")
+    finally:
+        conn.close()
+
+    if full_scans:
+        raise RuntimeError(
+            "Hot queries fall back to full table scans (missing indexes?):\n  " + "\n  ".join(full_scans)
+        )
+    logging.info(f"✅ Query plans OK for {len(queries)} hot queries.")
+
+# ----------------------------
+# LegiScan JSON -> row tuples
+# ----------------------------
+PEOPLE_UPSERT_SQL = '''
+    INSERT INTO people (people_id, bioguide_id, name, party, role, district)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(people_id) DO UPDATE SET
+        bioguide_id=excluded.bioguide_id,
+        name=excluded.name,
+        party=excluded.party,
+        role=excluded.role,
+        district=excluded.district
+'''
+
+BILL_INSERT_SQL = '''
+    INSERT OR IGNORE INTO bills (
+        bill_id, session_title, session_name, state_link, url,
+        status, status_date, doc_id, title, description
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+VOTE_INSERT_SQL = '''
+    INSERT OR IGNORE INTO votes (roll_call_id, bill_id, date, description, yea, nay, nv, absent, total, passed, url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+LEGISLATOR_VOTE_INSERT_SQL = '''
+    INSERT OR IGNORE INTO legislator_votes (roll_call_id, people_id, vote_text)
+    VALUES (?, ?, ?)'''
+
+INSERT_SQL = {
+    "people": PEOPLE_UPSERT_SQL,
+    "bills": BILL_INSERT_SQL,
+    "votes": VOTE_INSERT_SQL,
+    "legislator_votes": LEGISLATOR_VOTE_INSERT_SQL,
+}
+
+def person_row(person):
+    return (
+        person["people_id"],
+        person.get("bioguide_id"),
+        person["name"],
+        person["party"],
+        person["role"],
+        person["district"]
+    )
+
+def bill_row(bill_json):
+    return (
+        bill_json["bill_id"],
+        bill_json["session"]["session_title"],
+        bill_json["session"]["session_name"],
+        bill_json["state_link"],
+        bill_json["url"],
+        bill_json["status"],
+        bill_json["status_date"],
+        bill_json["texts"][0]["doc_id"] if bill_json.get("texts") else None,
+        bill_json["title"],
+        bill_json["description"]
+    )
+
+def vote_row(roll_call):
+    return (
+        roll_call["roll_call_id"],
+        roll_call["bill_id"],
+        roll_call["date"],
+        roll_call["desc"],
+        roll_call["yea"],
+        roll_call["nay"],
+        roll_call.get("nv", 0),
+        roll_call.get("absent", 0),
+        roll_call["total"],
+        roll_call["passed"],
+        roll_call.get("url", "")
+    )
+
+def legislator_vote_rows(roll_call):
+    return [
+        (roll_call["roll_call_id"], voter["people_id"], voter["vote_text"])
+        for voter in roll_call.get("votes", [])
+    ]
+
+SESSION_KINDS = ("people", "bill", "vote")
+
+def find_session_dirs(data_dir=DATA_DIR):
+    """Return every directory under data_dir that holds people/, bill/ or vote/ JSON folders.
+
+    Only directories are walked, with os.scandir, and the walk stops at each
+    session, so the individual JSON files are never listed here.
+    """
+    sessions = []
+    stack = [data_dir]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            subdirs = [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+        if any(entry.name in SESSION_KINDS for entry in subdirs):
+            sessions.append(os.path.normpath(directory))
+        else:
+            stack.extend(entry.path for entry in subdirs)
+    return sorted(sessions)
+
+def scan_session(session_dir):
+    """Return {kind: [(path, size, mtime_ns), ...]} for a session's JSON files.
+
+    One scandir pass per people/bill/vote folder; the size and mtime come from
+    the directory entry, so no extra per-file lookups are needed.
+    """
+    files = {}
+    for kind in SESSION_KINDS:
+        kind_dir = os.path.join(session_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        with os.scandir(kind_dir) as entries:
+            kind_files = []
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    stat = entry.stat()
+                    kind_files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        files[kind] = sorted(kind_files)
+    return files
+
+def file_key(path):
+    return os.path.relpath(path, DATA_DIR)
+
+def load_file_manifest(cursor, session_dir):
+    """Return the cached {path: (size, mtime_ns)} recorded the last time this session was loaded."""
+    cursor.execute(
+        "SELECT path, size, mtime_ns FROM dataset_files WHERE session_dir = ?",
+        (session_key(session_dir),)
+    )
+    return {path: (size, mtime_ns) for path, size, mtime_ns in cursor.fetchall()}
+
+def record_session_files(cursor, session_dir, files):
+    key = session_key(session_dir)
+    cursor.execute("DELETE FROM dataset_files WHERE session_dir = ?", (key,))
+    cursor.executemany(
+        "INSERT INTO dataset_files (path, session_dir, kind, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+        [
+            (file_key(path), key, kind, size, mtime_ns)
+            for kind, kind_files in files.items()
+            for path, size, mtime_ns in kind_files
+        ]
+    )
+
+def changed_session_files(files, cached):
+    """Keep only the files that are new or whose size/mtime differ from the cached manifest."""
+    return {
+        kind: [f for f in kind_files if cached.get(file_key(f[0])) != (f[1], f[2])]
+        for kind, kind_files in files.items()
+    }
+
+def session_key(session_dir):
+    return os.path.relpath(session_dir, DATA_DIR)
+
+def read_session_hash(session_dir):
+    """Return the contents of the session's LegiScan hash.md5, or None if it has none."""
+    path = os.path.join(session_dir, "hash.md5")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+def record_session_hash(cursor, session_dir):
+    cursor.execute('''
+        INSERT INTO dataset_sessions (session_dir, hash, loaded_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT(session_dir) DO UPDATE SET
+            hash=excluded.hash,
+            loaded_at=excluded.loaded_at
+    ''', (session_key(session_dir), read_session_hash(session_dir)))
+
+def parse_file(kind, path):
+    """Yield (table, row) tuples for one people/bill/vote JSON file."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if kind == "people":
+        person = data["person"]
+        logging.debug(f"Person {person['name']} bioguide_id {person.get('bioguide_id')}")
+        yield "people", person_row(person)
+    elif kind == "bill":
+        yield "bills", bill_row(data["bill"])
+    elif kind == "vote":
+        roll_call = data["roll_call"]
+        yield "votes", vote_row(roll_call)
+        for row in legislator_vote_rows(roll_call):
+            yield "legislator_votes", row
+
+def iter_session_rows(files):
+    """Yield (table, row) tuples for every file in a scan_session() listing."""
+    for kind in SESSION_KINDS:
+        for path, _, _ in files.get(kind, []):
+            yield from parse_file(kind, path)
+
+# ----------------------------
+# Row-at-a-time loader
+# ----------------------------
 def load_json_files():
-    conn = sqlite3.connect(DB_FILE)
+    conn = db.connect()
     cursor = conn.cursor()
 
-    # Recursively search for all JSON files in the nested directories
-    session_dirs = glob.glob(os.path.join(DATA_DIR, "**"), recursive=True)
-    for session_dir in session_dirs:
-        # Load people JSON files
-        people_files = glob.glob(os.path.join(session_dir, "people", "*.json"))
-        for file in people_files:
-            with open(file, "r", encoding="utf-8") as f:
-                person = json.load(f)["person"]
-
-                print("DEBUG: ", person["name"],"bioguide_id", person.get("bioguide_id"))
-                cursor.execute('''
-                    INSERT INTO people (people_id, bioguide_id, name, party, role, district)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(people_id) DO UPDATE SET
-                        bioguide_id=excluded.bioguide_id,
-                        name=excluded.name,
-                        party=excluded.party,
-                        role=excluded.role,
-                        district=excluded.district
-                ''', (
-                    person["people_id"],
-                    person.get("bioguide_id"),
-                    person["name"],
-                    person["party"],
-                    person["role"],
-                    person["district"]
-                ))
-
-                # logging.info(f"Inserted person {person['name']}")
-
-        # Bills
-        bill_files = glob.glob(os.path.join(session_dir, "bill", "*.json"))
-        for file in bill_files:
-            with open(file, "r", encoding="utf-8") as f:
-                bill_json = json.load(f)["bill"]
-                cursor.execute('''
-                    INSERT OR IGNORE INTO bills (
-                        bill_id, session_title, session_name, state_link, url,
-                        status, status_date, doc_id, title, description
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (
-                    bill_json["bill_id"],
-                    bill_json["session"]["session_title"],
-                    bill_json["session"]["session_name"],
-                    bill_json["state_link"],
-                    bill_json["url"],
-                    bill_json["status"],
-                    bill_json["status_date"],
-                    bill_json["texts"][0]["doc_id"] if bill_json.get("texts") else None,
-                    bill_json["title"],
-                    bill_json["description"]
-                ))
-                # logging.info(f"Inserted bill {bill_json['bill_number']}")
-
-        # Votes
-        vote_files = glob.glob(os.path.join(session_dir, "vote", "*.json"))
-        for file in vote_files:
-            with open(file, "r", encoding="utf-8") as f:
-                roll_call = json.load(f)["roll_call"]
-                cursor.execute('''
-                    INSERT OR IGNORE INTO votes (roll_call_id, bill_id, date, description, yea, nay, nv, absent, total, passed, url)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (
-                    roll_call["roll_call_id"],
-                    roll_call["bill_id"],
-                    roll_call["date"],
-                    roll_call["desc"],
-                    roll_call["yea"],
-                    roll_call["nay"],
-                    roll_call.get("nv", 0),
-                    roll_call.get("absent", 0),
-                    roll_call["total"],
-                    roll_call["passed"],
-                    roll_call.get("url", "")
-                ))
-
-            for voter in roll_call.get("votes", []):
-                cursor.execute('''
-                    INSERT OR IGNORE INTO legislator_votes (roll_call_id, people_id, vote_text)
-                    VALUES (?, ?, ?)''', (
-                    roll_call["roll_call_id"],
-                    voter["people_id"],
-                    voter["vote_text"]
-                ))
-
-            # logging.info(f"Inserted roll call {roll_call['roll_call_id']} into database")
+    for session_dir in find_session_dirs():
+        files = scan_session(session_dir)
+        for table, row in iter_session_rows(files):
+            cursor.execute(INSERT_SQL[table], row)
+        bump_data_version(cursor)
+        record_session_hash(cursor, session_dir)
+        record_session_files(cursor, session_dir, files)
+
+    refresh_final_votes(cursor)
+    conn.commit()
+    conn.close()
+
+# ----------------------------
+# Bulk loader
+# ----------------------------
+class TableBatcher:
+    """Buffers rows per table and writes them with executemany(), timing each table."""
+
+    def __init__(self, cursor, batch_size=BULK_BATCH_SIZE):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.pending = {table: [] for table in INSERT_SQL}
+        self.rows = {table: 0 for table in INSERT_SQL}
+        self.seconds = {table: 0.0 for table in INSERT_SQL}
+
+    def add(self, table, row):
+        batch = self.pending[table]
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in [table] if table else list(self.pending):
+            batch = self.pending[name]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            self.cursor.executemany(INSERT_SQL[name], batch)
+            self.seconds[name] += time.perf_counter() - start
+            self.rows[name] += len(batch)
+            self.pending[name] = []
+
+    def report(self, elapsed):
+        for table in INSERT_SQL:
+            rows, seconds = self.rows[table], self.seconds[table]
+            rate = rows / seconds if seconds else 0
+            logging.info(f"📊 {table}: {rows:,} rows, {seconds:.2f}s in SQLite ({rate:,.0f} rows/sec)")
+        total = sum(self.rows.values())
+        logging.info(f"⏱️ Bulk load finished: {total:,} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/sec overall)")
+
+def apply_bulk_pragmas(cursor):
+    for pragma, value in BULK_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+
+def bulk_load_json_files(batch_size=BULK_BATCH_SIZE):
+    """Load every session with executemany(), one transaction per session directory.
+
+    Secondary indexes are dropped for the duration of the load and rebuilt once
+    at the end, which is far cheaper than maintaining them row by row.
+    """
+    conn = db.connect()
+    cursor = conn.cursor()
+    apply_bulk_pragmas(cursor)
+    drop_indexes(cursor)
+    conn.commit()
+
+    batcher = TableBatcher(cursor, batch_size)
+    start = time.perf_counter()
 
+    for session_dir in find_session_dirs():
+        session_start = time.perf_counter()
+        files = scan_session(session_dir)
+        for table, row in iter_session_rows(files):
+            batcher.add(table, row)
+        batcher.flush()
+        bump_data_version(cursor)  # new bills and status_dates reorder the topic index
+        record_session_hash(cursor, session_dir)
+        record_session_files(cursor, session_dir, files)
+        conn.commit()
+        logging.info(f"✅ Loaded {session_key(session_dir)} in {time.perf_counter() - session_start:.2f}s")
+
+    refresh_final_votes(cursor)
+    conn.commit()
+
+    logging.info("🔧 Rebuilding indexes...")
+    index_start = time.perf_counter()
+    create_indexes(cursor)
     conn.commit()
+    logging.info(f"🔧 Indexes rebuilt in {time.perf_counter() - index_start:.2f}s")
+
+    batcher.report(time.perf_counter() - start)
     conn.close()
 
 
+# ----------------------------
+# Parallel loader
+# ----------------------------
+def parse_file_chunk(kind, files):
+    """Worker entry point: parse a list of JSON files into rows grouped by table."""
+    rows = {}
+    for file in files:
+        for table, row in parse_file(kind, file):
+            rows.setdefault(table, []).append(row)
+    return rows
+
+def iter_parse_tasks(manifest, chunk_files=PARSE_CHUNK_FILES):
+    for session_dir, files in manifest.items():
+        for kind in SESSION_KINDS:
+            paths = [path for path, _, _ in files.get(kind, [])]
+            for i in range(0, len(paths), chunk_files):
+                yield session_dir, kind, paths[i:i + chunk_files]
+
+def parallel_load_json_files(max_workers=None, batch_size=BULK_BATCH_SIZE, chunk_files=PARSE_CHUNK_FILES):
+    """Bulk load with JSON parsing fanned out over a process pool.
+
+    Worker processes only parse files into row tuples; this process is the single
+    writer that owns the SQLite connection. Results are consumed in submission
+    order, so sessions still commit one at a time and later sessions win people
+    upserts exactly as in the serial loaders.
+    """
+    conn = db.connect()
+    cursor = conn.cursor()
+    apply_bulk_pragmas(cursor)
+    drop_indexes(cursor)
+    conn.commit()
+
+    batcher = TableBatcher(cursor, batch_size)
+    start = time.perf_counter()
+    manifest = {session_dir: scan_session(session_dir) for session_dir in find_session_dirs()}
+
+    def finish_session(session_dir):
+        batcher.flush()
+        bump_data_version(cursor)
+        record_session_hash(cursor, session_dir)
+        record_session_files(cursor, session_dir, manifest[session_dir])
+        conn.commit()
+        logging.info(f"✅ Loaded {session_key(session_dir)}")
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # Keep a bounded window of chunks in flight so parsed rows never pile up
+        # in memory faster than the writer can drain them.
+        window = max_workers * 4
+        in_flight = deque()
+        current_session = None
+
+        def drain_one():
+            nonlocal current_session
+            session_dir, future = in_flight.popleft()
+            if current_session and session_dir != current_session:
+                finish_session(current_session)
+            current_session = session_dir
+            for table, rows in future.result().items():
+                for row in rows:
+                    batcher.add(table, row)
+
+        for session_dir, kind, files in iter_parse_tasks(manifest, chunk_files):
+            in_flight.append((session_dir, pool.submit(parse_file_chunk, kind, files)))
+            if len(in_flight) >= window:
+                drain_one()
+
+        while in_flight:
+            drain_one()
+
+        if current_session:
+            finish_session(current_session)
+
+    refresh_final_votes(cursor)
+    conn.commit()
+
+    logging.info("🔧 Rebuilding indexes...")
+    index_start = time.perf_counter()
+    create_indexes(cursor)
+    conn.commit()
+    logging.info(f"🔧 Indexes rebuilt in {time.perf_counter() - index_start:.2f}s")
+
+    batcher.report(time.perf_counter() - start)
+    conn.close()
+
+# ----------------------------
+# Incremental loader
+# ----------------------------
+# Columns the LegiScan dataset owns for each table, and the key each one is
+# upserted on. Anything not listed here (summary, topic, topic_scores,
+# full_text, ...) is ours and is never touched by an incremental refresh.
+DATASET_COLUMNS = {
+    "people": ("people_id", "bioguide_id", "name", "party", "role", "district"),
+    "bills": ("bill_id", "session_title", "session_name", "state_link", "url",
+              "status", "status_date", "doc_id", "title", "description"),
+    "votes": ("roll_call_id", "bill_id", "date", "description", "yea", "nay",
+              "nv", "absent", "total", "passed", "url"),
+    "legislator_votes": ("roll_call_id", "people_id", "vote_text"),
+}
+
+CONFLICT_KEYS = {
+    "people": ("people_id",),
+    "bills": ("bill_id",),
+    "votes": ("roll_call_id",),
+    "legislator_votes": ("roll_call_id", "people_id"),
+}
+
+def create_staging_tables(cursor):
+    for table, columns in DATASET_COLUMNS.items():
+        cursor.execute(f"DROP TABLE IF EXISTS temp.staging_{table}")
+        cursor.execute(f"CREATE TEMP TABLE staging_{table} ({', '.join(columns)})")
+        cursor.execute(f"DROP TABLE IF EXISTS temp.changed_{table}")
+        cursor.execute(f"CREATE TEMP TABLE changed_{table} ({', '.join(columns)})")
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS touched_bills (bill_id INTEGER PRIMARY KEY)")
+
+def upsert_changed_rows(cursor, table):
+    """Copy staged rows that differ from the live table into changed_<table>, then upsert them."""
+    columns = DATASET_COLUMNS[table]
+    keys = CONFLICT_KEYS[table]
+    column_list = ", ".join(columns)
+
+    # Key lookups go through the primary key / unique index, so this never scans the live table
+    same_row = " AND ".join(f"live.{col} IS s.{col}" for col in columns)
+    cursor.execute(f'''
+        INSERT INTO changed_{table} ({column_list})
+        SELECT {column_list} FROM staging_{table} AS s
+        WHERE NOT EXISTS (SELECT 1 FROM {table} AS live WHERE {same_row})
+    ''')
+
+    updates = ", ".join(f"{col}=excluded.{col}" for col in columns if col not in keys)
+    # "WHERE true" keeps SQLite from parsing ON CONFLICT as a join constraint
+    cursor.execute(f'''
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM changed_{table} WHERE true
+        ON CONFLICT({", ".join(keys)}) DO UPDATE SET {updates}
+    ''')
+
+    cursor.execute(f"SELECT COUNT(*) FROM changed_{table}")
+    return cursor.fetchone()[0]
+
+def incremental_load_json_files(batch_size=BULK_BATCH_SIZE):
+    """Refresh only the sessions whose hash.md5 changed since the last load.
+
+    Within a changed session only files that are new or whose size/mtime differ
+    from the cached dataset_files manifest are parsed. Their rows are staged in
+    temp tables and compared with what is already loaded; only new or changed
+    people, bills, votes and legislator votes are upserted. AI summaries, topics
+    and full texts are left alone. Returns the set of bill_ids whose bill row or
+    votes changed.
+    """
+    conn = db.connect()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT session_dir, hash FROM dataset_sessions")
+    loaded_hashes = dict(cursor.fetchall())
+
+    create_staging_tables(cursor)
+    touched = set()
+
+    for session_dir in find_session_dirs():
+        key = session_key(session_dir)
+        current_hash = read_session_hash(session_dir)
+        if current_hash and loaded_hashes.get(key) == current_hash:
+            logging.info(f"⏭️ {key} unchanged (hash {current_hash}), skipping.")
+            continue
+
+        session_start = time.perf_counter()
+        files = scan_session(session_dir)
+        changed_files = changed_session_files(files, load_file_manifest(cursor, session_dir))
+        for table in DATASET_COLUMNS:
+            cursor.execute(f"DELETE FROM staging_{table}")
+            cursor.execute(f"DELETE FROM changed_{table}")
+
+        pending = {table: [] for table in DATASET_COLUMNS}
+        for table, row in iter_session_rows(changed_files):
+            batch = pending[table]
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(f"INSERT INTO staging_{table} VALUES ({', '.join('?' * len(row))})", batch)
+                pending[table] = []
+        for table, batch in pending.items():
+            if batch:
+                cursor.executemany(f"INSERT INTO staging_{table} VALUES ({', '.join('?' * len(batch[0]))})", batch)
+
+        counts = {table: upsert_changed_rows(cursor, table) for table in DATASET_COLUMNS}
+
+        cursor.execute("DELETE FROM touched_bills")
+        cursor.execute('''
+            INSERT OR IGNORE INTO touched_bills (bill_id)
+            SELECT bill_id FROM changed_bills
+            UNION SELECT bill_id FROM changed_votes
+            UNION SELECT staging_votes.bill_id FROM changed_legislator_votes
+                  JOIN staging_votes ON staging_votes.roll_call_id = changed_legislator_votes.roll_call_id
+        ''')
+        cursor.execute("SELECT bill_id FROM touched_bills")
+        session_touched = [row[0] for row in cursor.fetchall()]
+        touched.update(session_touched)
+        refresh_final_votes(cursor, session_touched)
+
+        if counts["bills"]:
+            bump_data_version(cursor)  # status_date changes reorder the topic index
+
+        record_session_hash(cursor, session_dir)
+        record_session_files(cursor, session_dir, files)
+        conn.commit()
+
+        parsed = sum(len(kind_files) for kind_files in changed_files.values())
+        changes = ", ".join(f"{table} {count:,}" for table, count in counts.items())
+        logging.info(
+            f"🔄 {key} refreshed in {time.perf_counter() - session_start:.2f}s "
+            f"({parsed:,} changed files; {changes} rows changed)"
+        )
+
+    conn.close()
+    logging.info(f"✅ Incremental load complete: {len(touched):,} bills touched.")
+    return touched
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the schema and load the LegiScan bulk JSON.")
+    parser.add_argument(
+        "--mode", choices=["bulk", "parallel", "incremental", "row"], default="bulk",
+        help="bulk: batched executemany per session (default); parallel: bulk with a "
+             "process pool parsing JSON; incremental: only sessions whose hash.md5 "
+             "changed, upserting changed rows; row: one INSERT per record"
+    )
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parser processes for --mode parallel (default: CPU count)")
+    args = parser.parse_args()
+
     initialize_db()
-    load_json_files()
+    if args.mode == "row":
+        load_json_files()
+    elif args.mode == "parallel":
+        parallel_load_json_files(max_workers=args.workers)
+    elif args.mode == "incremental":
+        incremental_load_json_files()
+    else:
+        bulk_load_json_files()
+    check_query_plans()
@@ -0,0 +1,129 @@
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import db
+
+# ----------------------------
+# 🧊 Two-tier cache for external API responses
+# ----------------------------
+# Each cache keeps a small in-memory LRU per process, backed by the api_cache
+# table so entries survive restarts and are shared by every gunicorn worker.
+# Only successful lookups are cached; values must be JSON-serializable.
+# StaleWhileRevalidateCache below is memory-only, for short-lived data like news.
+DEFAULT_MAX_ENTRIES = 1024
+
+class TTLCache:
+    def __init__(self, namespace, ttl_seconds, max_entries=DEFAULT_MAX_ENTRIES):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory = OrderedDict()    # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Cached value for key, or None if missing or expired."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[0] > now:
+                self.memory.move_to_end(key)
+                return entry[1]
+            self.memory.pop(key, None)
+
+        row = db.reader().execute(
+            "SELECT value, expires_at FROM api_cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, now)
+        ).fetchone()
+        if not row:
+            return None
+
+        value = json.loads(row[0])
+        self.remember(key, value, row[1])
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self.remember(key, value, expires_at)
+
+        db.write(self.store, key, json.dumps(value), expires_at, now)
+
+    def store(self, cursor, key, value_json, expires_at, now):
+        cursor.execute('''
+            INSERT INTO api_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+        ''', (self.namespace, key, value_json, expires_at))
+        cursor.execute("DELETE FROM api_cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+
+    def remember(self, key, value, expires_at):
+        with self.lock:
+            self.memory[key] = (expires_at, value)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+class StaleWhileRevalidateCache:
+    """In-memory cache that serves slightly stale values while refreshing them in the background.
+
+    lookup(key) returns a Future. A fresh entry resolves immediately. A stale
+    one (older than fresh_seconds, younger than stale_seconds) also resolves
+    immediately and schedules one background refresh. A missing or expired
+    entry is fetched on `executor`. Concurrent lookups of a key share one fetch.
+    Failed fetches are not cached, and a failed refresh keeps the stale value.
+    """
+
+    def __init__(self, fetch, fresh_seconds, stale_seconds, executor, max_entries=DEFAULT_MAX_ENTRIES):
+        self.fetch = fetch
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.executor = executor
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # key -> (fetched_at, value)
+        self.in_flight = {}            # key -> Future of the running fetch
+        # Re-entrant: a fetch that finishes before add_done_callback runs its callback in start_fetch
+        self.lock = threading.RLock()
+
+    def lookup(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            age = now - entry[0] if entry else None
+            if entry and age < self.stale_seconds:
+                self.entries.move_to_end(key)
+                if age >= self.fresh_seconds:
+                    self.start_fetch(key)
+                done = Future()
+                done.set_result(entry[1])
+                return done
+            return self.start_fetch(key)
+
+    def start_fetch(self, key):
+        """Future for key's fetch, starting one unless it is already running. Call with self.lock held."""
+        future = self.in_flight.get(key)
+        if future is None:
+            future = self.in_flight[key] = self.executor.submit(self.fetch, key)
+            future.add_done_callback(lambda f, key=key: self.finish_fetch(key, f))
+        return future
+
+    def finish_fetch(self, key, future):
+        with self.lock:
+            self.in_flight.pop(key, None)
+            if future.exception() is not None:
+                logging.warning(f"⚠️ Refresh of {key!r} failed: {future.exception()}")
+                return
+            self.entries[key] = (time.time(), future.result())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+def normalize_address(address):
+    """Case, punctuation and spacing variants of one address map to the same key."""
+    return " ".join(re.sub(r"[.,#]", " ", address.casefold()).split())
+
+def location_key(lat, lng, places=3):
+    """Round to ~110 m so nearby lookups share an entry without crossing most district lines."""
+    return f"{round(lat, places):.{places}f},{round(lng, places):.{places}f}"
@@ -8,28 +8,39 @@ load_dotenv()
 
 DB_PATH = "legislation.db"
 
+# --incremental keeps the existing database (and its paid AI summaries/topics)
+# and only re-imports LegiScan sessions whose hash.md5 changed.
+incremental = "--incremental" in sys.argv[1:]
+# --snapshot finishes by publishing a read-only snapshot for USE_SNAPSHOT=1 web/worker processes.
+publish_snapshot = "--snapshot" in sys.argv[1:]
+
 scripts = [
-    "initialize_database.py",
-    "fetch_bill_texts.py",
-    "classify.py"
+    ["initialize_database.py", "--mode", "incremental" if incremental else "bulk"],
+    ["fetch_bill_texts.py"],
+    ["classify.py"]
 ]
+if publish_snapshot:
+    scripts.append(["snapshot.py"])
 
-# Option 2: Python quick-fix
-open("fetched_bills.log", "w").close()
-open("failed_bills.log", "w").close()
-
-# 🧹 Safely delete DB if it exists
-if os.path.exists(DB_PATH):
-    print(f"🧨 Removing {DB_PATH}...")
-    os.remove(DB_PATH)
+if incremental:
+    print("🔄 Incremental refresh: keeping existing database and logs.")
 else:
-    print(f"ℹ️ No existing {DB_PATH} found.")
+    # Option 2: Python quick-fix
+    open("fetched_bills.log", "w").close()
+    open("failed_bills.log", "w").close()
+
+    # 🧹 Safely delete DB if it exists
+    if os.path.exists(DB_PATH):
+        print(f"🧨 Removing {DB_PATH}...")
+        os.remove(DB_PATH)
+    else:
+        print(f"ℹ️ No existing {DB_PATH} found.")
 
 # 🚀 Run pipeline
-for script in scripts:
+for script, *args in scripts:
     print(f"🚀 Running {script}...")
     start = time.time()
-    result = subprocess.run([sys.executable, script])
+    result = subprocess.run([sys.executable, script, *args])
     end = time.time()
 
     if result.returncode != 0:
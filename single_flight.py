@@ -0,0 +1,107 @@
+import os
+import time
+import socket
+import logging
+import threading
+import db
+
+# ----------------------------
+# 🛫 Single-flight for expensive per-bill work
+# ----------------------------
+# Two callers asking for the same (operation, bill_id) at once should pay for it
+# once. Inside a process, later callers wait on the first caller's Event and get
+# its result. Across processes (summary workers, gunicorn workers, classify.py)
+# the first caller holds a lease row in flight_leases; others poll until the
+# owner stores its result or the lease expires (the owner died), then either
+# read the stored result or take the lease themselves. While compute() runs, the
+# owner renews its lease every third of DEFAULT_LEASE_SECONDS, so a slow call
+# keeps it and a dead owner's lease lapses within that time.
+DEFAULT_LEASE_SECONDS = 10 * 60
+POLL_INTERVAL_SECONDS = 0.5
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+flights = {}
+flights_lock = threading.Lock()
+
+def lease_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def acquire_lease(operation, key, owner, lease_seconds):
+    """Take the lease unless another owner holds an unexpired one. Returns True on success."""
+    now = time.time()
+    return db.execute('''
+        INSERT INTO flight_leases (operation, key, owner, expires_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(operation, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+        WHERE flight_leases.expires_at < ? OR flight_leases.owner = excluded.owner
+    ''', (operation, str(key), owner, now + lease_seconds, now)) == 1
+
+def release_lease(operation, key, owner):
+    db.execute("DELETE FROM flight_leases WHERE operation = ? AND key = ? AND owner = ?", (operation, str(key), owner))
+
+def renew_lease(operation, key, owner, lease_seconds, stop):
+    """Heartbeat thread: re-take the lease every lease_seconds / 3 until `stop` is set."""
+    while not stop.wait(lease_seconds / 3):
+        try:
+            if not acquire_lease(operation, key, owner, lease_seconds):
+                logging.warning(f"⚠️ Lost the {operation} lease for {key} to another process")
+                return
+        except Exception as e:
+            logging.warning(f"⚠️ Couldn't renew the {operation} lease for {key}: {e}")
+
+def run_once(operation, key, compute, lookup, lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=POLL_INTERVAL_SECONDS):
+    """Return lookup() if a result is already stored, otherwise compute() it, at most once at a time.
+
+    lookup() reads the stored result (None if there is none yet); compute()
+    produces and stores it. Errors from compute() propagate to every caller
+    waiting on it in this process.
+    """
+    flight_key = (operation, key)
+    with flights_lock:
+        flight = flights.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = flights[flight_key] = Flight()
+
+    if not leader:
+        logging.info(f"⏳ Waiting on in-flight {operation} for {key}")
+        flight.done.wait()
+        if flight.error:
+            raise flight.error
+        return flight.result
+
+    owner = lease_owner()
+    try:
+        waited = False
+        while True:
+            result = lookup()
+            if result is not None:
+                flight.result = result
+                break
+            if acquire_lease(operation, key, owner, lease_seconds):
+                stop = threading.Event()
+                heartbeat = threading.Thread(target=renew_lease, args=(operation, key, owner, lease_seconds, stop), daemon=True)
+                heartbeat.start()
+                try:
+                    flight.result = compute()
+                finally:
+                    stop.set()
+                    heartbeat.join()
+                    release_lease(operation, key, owner)
+                break
+            if not waited:
+                logging.info(f"⏳ {operation} for {key} is running in another process; waiting for it")
+                waited = True
+            time.sleep(poll_interval)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with flights_lock:
+            del flights[flight_key]
+        flight.done.set()
+    return flight.result
@@ -0,0 +1,181 @@
+import os
+import time
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+import db
+from config import DB_FILE, SNAPSHOT_DIR, OVERLAY_DB_FILE
+from bill_topics import bump_data_version
+from initialize_database import create_indexes, create_unique_indexes, check_query_plans
+
+# ----------------------------
+# 📸 Read-only snapshot publishing
+# ----------------------------
+# The web tier only ever writes summaries, topics, the summary queue and its
+# caches. `python snapshot.py` folds those overlay writes back into DB_FILE,
+# VACUUMs it into a new, fully indexed file in SNAPSHOT_DIR and then points
+# SNAPSHOT_DIR/CURRENT at it with an atomic rename. Processes running with
+# USE_SNAPSHOT=1 notice the new pointer within db.SNAPSHOT_CHECK_SECONDS and
+# reopen their connections on it; no restart needed. A published file is never
+# written again, which is what makes opening it immutable safe.
+KEEP_SNAPSHOTS = 3             # published files kept on disk, the current one included
+SNAPSHOT_PREFIX = "legislation-"
+
+# Tables the overlay keeps its own copies of. They are created from DB_FILE's
+# schema and start with its rows, except data_versions, whose overlay counter
+# is added to the snapshot's (see db.attach_snapshot).
+OVERLAY_TABLES = ("summary_jobs", "chunk_summaries", "chunk_cache_stats", "flight_leases", "api_cache", "data_versions")
+
+def create_overlay(conn):
+    """Create the overlay's tables if they are missing. `conn` is the overlay with DB_FILE attached as "source"."""
+    cursor = conn.cursor()
+    for table in OVERLAY_TABLES:
+        cursor.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if cursor.fetchone():
+            continue
+        cursor.execute(
+            "SELECT sql FROM source.sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL ORDER BY type DESC",
+            (table,)
+        )
+        for (sql,) in cursor.fetchall():   # the table first, then its indexes
+            cursor.execute(sql)
+        if table != "data_versions":
+            cursor.execute(f"INSERT INTO main.{table} SELECT * FROM source.{table}")
+
+    # Summaries and topics generated since the snapshot (read through the views in db.attach_snapshot)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS main.bill_overrides (
+        bill_id INTEGER PRIMARY KEY,
+        summary TEXT,             -- NULL: the snapshot's summary
+        topic TEXT,               -- NULL: the bill's topic and topic rows are the snapshot's
+        topic_scores TEXT
+    )''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS main.bill_topic_overrides (
+        bill_id INTEGER,
+        topic TEXT,
+        score REAL,
+        PRIMARY KEY (bill_id, topic)
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS main.idx_bill_topic_overrides_topic ON bill_topic_overrides(topic, bill_id)")
+    conn.commit()
+
+def prune_overlay(conn, live_path):
+    """Drop overrides the live snapshot already contains, so the overlay stays small.
+
+    Only overrides merged by an earlier publish can match, and by now every
+    process has moved to the snapshot that contains them.
+    """
+    cursor = conn.cursor()
+    cursor.execute("ATTACH DATABASE ? AS live", (db.snapshot_uri(live_path),))
+    cursor.execute('''
+        DELETE FROM main.bill_overrides WHERE bill_id IN (
+            SELECT o.bill_id FROM main.bill_overrides AS o JOIN live.bills AS b ON b.bill_id = o.bill_id
+            WHERE (o.summary IS NULL OR o.summary IS b.summary)
+              AND (o.topic IS NULL OR (o.topic IS b.topic AND o.topic_scores IS b.topic_scores))
+        )
+    ''')
+    pruned = cursor.rowcount
+    cursor.execute('''
+        DELETE FROM main.bill_topic_overrides WHERE bill_id NOT IN (
+            SELECT bill_id FROM main.bill_overrides WHERE topic IS NOT NULL
+        )
+    ''')
+    conn.commit()
+    cursor.execute("DETACH DATABASE live")
+    if pruned:
+        logging.info(f"🧹 Pruned {pruned:,} overlay overrides already in {os.path.basename(live_path)}.")
+
+def merge_overlay(conn):
+    """Copy the overlay's summaries and topics into DB_FILE, so the next snapshot carries them."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE source.bills AS b
+        SET summary = COALESCE(o.summary, b.summary),
+            topic = COALESCE(o.topic, b.topic),
+            topic_scores = COALESCE(o.topic_scores, b.topic_scores)
+        FROM main.bill_overrides AS o
+        WHERE o.bill_id = b.bill_id
+    ''')
+    merged = cursor.rowcount
+    cursor.execute('''
+        DELETE FROM source.bill_topics WHERE bill_id IN (
+            SELECT bill_id FROM main.bill_overrides WHERE topic IS NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT INTO source.bill_topics (bill_id, topic, score) SELECT bill_id, topic, score FROM main.bill_topic_overrides")
+    conn.commit()
+    if merged:
+        logging.info(f"🔀 Merged {merged:,} overlay summaries/topics into {DB_FILE}.")
+
+def build_snapshot(path):
+    """VACUUM DB_FILE into `path` and make sure every index exists."""
+    conn = db.connect()
+    bump_data_version(conn.cursor())   # readers' topic indexes rebuild once they switch
+    conn.commit()
+    conn.execute("VACUUM INTO ?", (path,))
+    conn.close()
+
+    # A plain connection: db.connect() would switch the file to WAL, which an immutable open can't use
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    cursor = conn.cursor()
+    create_unique_indexes(cursor)
+    create_indexes(cursor)
+    conn.commit()
+    conn.close()
+
+def point_current_at(path):
+    """Atomically switch SNAPSHOT_DIR/CURRENT to `path`."""
+    pointer = os.path.join(SNAPSHOT_DIR, db.SNAPSHOT_POINTER)
+    tmp_pointer = f"{pointer}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(os.path.basename(path))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+
+def remove_old_snapshots(keep=KEEP_SNAPSHOTS):
+    # Processes still reading a removed file keep it open until they switch; POSIX frees it after that
+    names = sorted(name for name in os.listdir(SNAPSHOT_DIR) if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".db"))
+    for name in names[:-keep]:
+        os.remove(os.path.join(SNAPSHOT_DIR, name))
+        logging.info(f"🗑️ Removed old snapshot {name}")
+
+def publish(keep=KEEP_SNAPSHOTS):
+    """Publish a new snapshot of DB_FILE and make it current. Returns its path."""
+    start = time.perf_counter()
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+    overlay = db.connect(OVERLAY_DB_FILE)
+    overlay.execute("ATTACH DATABASE ? AS source", (DB_FILE,))
+    create_overlay(overlay)
+    live_path = db.published_snapshot()
+    if live_path and os.path.exists(live_path):
+        prune_overlay(overlay, live_path)
+    merge_overlay(overlay)
+    overlay.close()
+
+    name = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+    path = os.path.join(SNAPSHOT_DIR, name)
+    tmp_path = f"{path}.tmp"
+    build_snapshot(tmp_path)
+    try:
+        check_query_plans(path=tmp_path)
+    except RuntimeError:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    point_current_at(path)
+    remove_old_snapshots(keep)
+
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"📸 Published {name} ({size_mb:,.1f} MB) in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish an immutable snapshot of the database for USE_SNAPSHOT=1 processes.")
+    parser.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS,
+                        help="snapshot files to keep on disk, the new one included")
+    args = parser.parse_args()
+    publish(keep=max(args.keep, 1))
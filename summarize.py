@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import openai
+import db
+from config import TOPIC_CATEGORIES
+from bill_texts import load_full_text
+from bill_topics import store_bill_topics
+from ai_pricing import MODEL, CHUNK_PROMPT, chunk_bill_text, count_tokens
+from chunk_cache import cache_key, lookup_summaries, store_summaries
+from single_flight import run_once
+from classify import get_classifier, topics_from_result
+
+# ✅ OpenAI call settings
+SUMMARY_MODEL = MODEL                                   # same model the cost estimate and cache keys use
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")          # point at a local fake server to test
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))             # in-flight calls per bill
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))   # in-flight calls per process
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))                # seconds per call
+OPENAI_MAX_RETRIES = 4
+OPENAI_BACKOFF_BASE = 1.0
+OPENAI_BACKOFF_MAX = 30.0
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# Shared by every summary worker thread, so concurrent bills together never
+# exceed OPENAI_MAX_CONCURRENCY requests to the provider
+openai_slots = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+openai_client = None
+openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """One client per process so calls reuse its connection pool. Retries are done in chat_completion."""
+    global openai_client
+    if openai_client is None:
+        with openai_client_lock:
+            if openai_client is None:
+                openai_client = openai.OpenAI(
+                    api_key=openai.api_key,
+                    base_url=OPENAI_BASE_URL,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=0
+                )
+    return openai_client
+
+def chat_completion(messages, model=SUMMARY_MODEL):
+    """Run one chat completion under the global cap, retrying transient errors with jittered backoff."""
+    client = get_openai_client()
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            with openai_slots:
+                response = client.chat.completions.create(model=model, messages=messages)
+            return response.choices[0].message.content.strip()
+        except RETRYABLE_ERRORS as e:
+            if attempt == OPENAI_MAX_RETRIES:
+                raise
+            # Sleep outside the semaphore so a backing-off call doesn't hold a slot
+            delay = min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            logging.warning(f"🔁 OpenAI call failed ({type(e).__name__}), retry {attempt + 1}/{OPENAI_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+def summarize_chunks(bill_id, chunks, concurrency=CHUNK_CONCURRENCY):
+    """Map phase: summarize chunks concurrently, returning summaries in chunk order.
+
+    Chunks already in the chunk cache are not sent again, and a chunk repeated
+    within the bill is summarized once.
+    """
+    keys = [cache_key(chunk, CHUNK_PROMPT, SUMMARY_MODEL) for chunk in chunks]
+    cached = db.write(lookup_summaries, keys)  # also records hits and LRU use
+
+    missing = {}
+    for key, chunk in zip(keys, chunks):
+        if key not in cached:
+            missing.setdefault(key, chunk)
+
+    def summarize_chunk(indexed_chunk):
+        i, chunk = indexed_chunk
+        chunk_summary = chat_completion([
+            {"role": "system", "content": CHUNK_PROMPT},
+            {"role": "user", "content": chunk}
+        ])
+        logging.info(f"✅ Bill {bill_id} chunk {i+1}/{len(missing)} summarized.")
+        return chunk_summary
+
+    start = time.perf_counter()
+    fresh = {}
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(missing)))) as pool:
+            # map() yields in submission order; the first failed chunk re-raises here
+            fresh = dict(zip(missing, pool.map(summarize_chunk, enumerate(missing.values()))))
+        db.write(store_summaries, [
+            (key, summary, count_tokens(CHUNK_PROMPT + missing[key]), count_tokens(summary))
+            for key, summary in fresh.items()
+        ])
+    logging.info(
+        f"⏱️ Bill {bill_id}: {len(chunks)} chunks ({len(chunks) - len(missing)} from cache) "
+        f"summarized in {time.perf_counter() - start:.1f}s"
+    )
+    return [cached[key] if key in cached else fresh[key] for key in keys]
+
+# ----------------------------
+# 📝 Use AI to Summarize Bills
+# ----------------------------
+def summarize_and_store_bill(bill_id, vote_text=None, outcome=None, topic=None, legislator=None):
+    """Summarize a full bill using chunked summarization if needed.
+
+    Concurrent calls for the same bill, in this process or another, share one
+    summarization run instead of each paying for the GPT-4 calls.
+    """
+    return run_once(
+        "summary", bill_id,
+        compute=lambda: generate_and_store_summary(bill_id, vote_text, outcome, topic, legislator),
+        lookup=lambda: stored_column("summary", bill_id)
+    )
+
+def stored_column(column, bill_id):
+    """bills.<column> for bill_id, or None if it is empty or the bill doesn't exist."""
+    row = db.reader().execute(f"SELECT {column} FROM bills WHERE bill_id = ?", (bill_id,)).fetchone()
+    return row[0] if row and row[0] and row[0].strip() else None
+
+def generate_and_store_summary(bill_id, vote_text=None, outcome=None, topic=None, legislator=None):
+    """Summarize the bill and store the summary.
+
+    Errors are raised, not stored: the summary queue retries the job and
+    marks it failed after MAX_ATTEMPTS (see summary_queue.fail_job).
+    """
+    MAX_CHUNKS = 30
+    MAX_CHUNKS_FOR_FINAL_SUMMARY = 20
+    MAX_FINAL_SUMMARY_LENGTH = 8000  # characters
+
+    cursor = db.reader().cursor()
+
+    cursor.execute("SELECT summary, title, description FROM bills WHERE bill_id = ?", (bill_id,))
+    row = cursor.fetchone()
+    if not row:
+        logging.warning(f"Bill {bill_id} not found in DB.")
+        return "Bill not found."
+
+    summary, title, description = row
+
+    if summary:
+        logging.info(f"📄 Summary for bill {bill_id} reused for legislator: {legislator.get('name') if legislator else 'Unknown'}")
+        return summary
+
+    full_text = load_full_text(cursor, bill_id)
+    if not full_text or len(full_text.strip()) < 100:
+        logging.warning(f"❌ No usable full text found for bill {bill_id}.")
+        return "No full text available for summarization."
+
+    # Step 1: Chunk the full text
+    chunks = chunk_bill_text(full_text)
+    total_tokens = sum(tokens for _, tokens in chunks)
+    logging.info(f"✂️ Bill {bill_id} split into {len(chunks)} chunks ({total_tokens:,} tokens).")
+
+    if len(chunks) > MAX_CHUNKS:
+        dropped_tokens = sum(tokens for _, tokens in chunks[MAX_CHUNKS:])
+        logging.warning(f"⚠️ Truncating bill {bill_id} to {MAX_CHUNKS} chunks, dropping {dropped_tokens:,} of {total_tokens:,} tokens.")
+        chunks = chunks[:MAX_CHUNKS]
+    chunks = [chunk for chunk, _ in chunks]
+
+    # Step 2: Summarize the chunks concurrently
+    chunk_summaries = summarize_chunks(bill_id, chunks)
+
+    # Step 3: Prepare combined summary
+    limited_summaries = chunk_summaries[:MAX_CHUNKS_FOR_FINAL_SUMMARY]
+    combined_summary_text = "\n".join(limited_summaries)
+    outcome_text = outcome or "This bill received a final vote."
+    vote_line = f"The legislator voted: {vote_text}." if vote_text else ""
+
+    # Step 4: Ensure topic classification
+    if not topic or not topic.strip():
+        logging.info(f"🏷️ Bill {bill_id} has no topic. Attempting classification...")
+        topic = classify_bill_if_needed(
+            bill_id=bill_id,
+            title=title,
+            description=description,
+            full_text=full_text,
+            existing_topic=topic
+        )
+
+    # Step 5: Final AI summary
+    try:
+        final_summary = chat_completion([
+            {"role": "system", "content": (
+                f"Combine the following section summaries into a single, plain-English summary of the bill. "
+                f"{outcome_text} "
+                f"The bill is categorized under the topic(s): {topic}. "
+                f"Explain the bill's intended purpose and how it could affect these topics. "
+                f"Then, briefly highlight potential benefits, as well as possible downsides or tradeoffs, in a way that's accessible to regular voters. "
+                f"Be concise, informative, and maintain a neutral tone."
+            )},
+            {"role": "user", "content": combined_summary_text[:MAX_FINAL_SUMMARY_LENGTH]}
+        ])
+        final_summary = " ".join(final_summary.split())  # optional whitespace cleanup
+        logging.info(f"🧠 Final AI summary created for bill {bill_id}.")
+
+    except Exception as e:
+        logging.error(f"⚠️ Final summary failed for bill {bill_id}: {e}")
+        final_summary = combined_summary_text[:MAX_FINAL_SUMMARY_LENGTH] + "\n\n(Note: Full summary truncated due to token limits or errors)"
+
+    # Step 6: Store final summary
+    db.execute("UPDATE bills SET summary = ? WHERE bill_id = ?", (final_summary, bill_id))
+
+    return final_summary
+
+
+# ----------------------------
+# 🎨 Classify bills, if needed
+# ----------------------------
+
+def classify_bill_if_needed(bill_id, title=None, description=None, full_text=None, existing_topic=None):
+    """Run AI classification using full_text if available. Save results in DB.
+
+    Like summaries, concurrent classifications of one bill run only once.
+    """
+
+    if existing_topic and existing_topic.strip():
+        return existing_topic
+
+    return run_once(
+        "classify", bill_id,
+        compute=lambda: classify_and_store_topic(bill_id, title, description, full_text),
+        lookup=lambda: stored_column("topic", bill_id)
+    )
+
+def classify_and_store_topic(bill_id, title=None, description=None, full_text=None):
+    base_text = full_text if full_text and len(full_text.strip()) > 100 else description
+    if not base_text or len(base_text.strip()) < 20:
+        topic_str = "Miscellaneous"
+        score_json = json.dumps({"Miscellaneous": 1.0})
+    else:
+        input_text = f"Title: {title}\n{base_text[:2000]}"
+
+        try:
+            # Loaded on first use and shared by every thread in this worker
+            result = get_classifier()(input_text, TOPIC_CATEGORIES, multi_label=True)
+            topic_str, score_json = topics_from_result(result)
+
+        except Exception as e:
+            logging.warning(f"⚠️ Failed to classify bill {bill_id}: {e}")
+            topic_str = "Miscellaneous"
+            score_json = json.dumps({"Miscellaneous": 1.0})
+
+    # ✅ Save topic and scores to DB
+    try:
+        db.write(store_bill_topics, [(topic_str, score_json, bill_id)])
+        logging.info(f"🏷️ Bill {bill_id} classified as: {topic_str}")
+    except Exception as e:
+        logging.error(f"❌ DB error while saving topic for bill {bill_id}: {e}")
+
+    return topic_str
@@ -0,0 +1,153 @@
+import os
+import time
+import logging
+import argparse
+import threading
+import db
+
+# ----------------------------
+# 🗂️ Persistent summary job queue
+# ----------------------------
+# The web app never calls the LLM itself: when a bill has no summary it drops a
+# row in summary_jobs and answers right away with a "pending" status. Worker
+# threads started by `python summary_queue.py` (the Procfile "worker" process)
+# claim jobs, run summarize_and_store_bill() and mark them done. Jobs survive
+# restarts, and a job whose worker died is picked up again once its lease expires.
+NUM_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+LEASE_SECONDS = 15 * 60      # a running job is considered abandoned after this long
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 60     # multiplied by the attempt number
+POLL_INTERVAL_SECONDS = 2
+REQUEUE_AFTER_SECONDS = 60 * 60   # a failed job, or a done one that left no summary, can be queued again after this long
+
+def enqueue_summary(cursor, bill_id, vote_text=None, outcome=None, topic=None):
+    """Queue a summary for bill_id (see enqueue_summaries). Returns the job's status."""
+    return enqueue_summaries(cursor, {bill_id: (vote_text, outcome, topic)})[bill_id]
+
+def enqueue_summaries(cursor, jobs):
+    """Queue {bill_id: (vote_text, outcome, topic)} in one statement. Returns {bill_id: status}.
+
+    A bill that is already queued or running keeps its job. One whose job
+    failed, or finished without storing a summary, is queued afresh once
+    REQUEUE_AFTER_SECONDS have passed since the job last changed.
+    """
+    if not jobs:
+        return {}
+    now = time.time()
+    cursor.executemany('''
+        INSERT INTO summary_jobs (bill_id, status, vote_text, outcome, topic, attempts, available_at, created_at, updated_at)
+        VALUES (?, 'pending', ?, ?, ?, 0, ?, ?, ?)
+        ON CONFLICT(bill_id) DO UPDATE SET
+            status = 'pending', vote_text = excluded.vote_text, outcome = excluded.outcome, topic = excluded.topic,
+            attempts = 0, last_error = NULL, available_at = excluded.available_at, updated_at = excluded.updated_at
+        WHERE summary_jobs.updated_at < ?
+          AND (summary_jobs.status = 'failed'
+               OR (summary_jobs.status = 'done' AND NOT EXISTS (
+                   SELECT 1 FROM bills WHERE bills.bill_id = summary_jobs.bill_id AND bills.summary IS NOT NULL)))
+    ''', [(bill_id, vote_text, outcome, topic, now, now, now, now - REQUEUE_AFTER_SECONDS)
+          for bill_id, (vote_text, outcome, topic) in jobs.items()])
+
+    placeholders = ",".join("?" * len(jobs))
+    cursor.execute(f"SELECT bill_id, status FROM summary_jobs WHERE bill_id IN ({placeholders})", list(jobs))
+    return dict(cursor.fetchall())
+
+def summary_status(cursor, bill_id):
+    """One of 'pending', 'running', 'done', 'failed', or None if the bill was never queued."""
+    cursor.execute("SELECT status FROM summary_jobs WHERE bill_id = ?", (bill_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def claim_job(cursor, lease_seconds=LEASE_SECONDS):
+    """Take the oldest runnable job. Returns (bill_id, vote_text, outcome, topic) or None.
+
+    A db.write() job: the writer's transaction holds the write lock from the
+    SELECT to the UPDATE, so two workers can never claim the same row.
+    """
+    now = time.time()
+    cursor.execute('''
+        SELECT bill_id, vote_text, outcome, topic FROM summary_jobs
+        WHERE (status = 'pending' AND available_at <= ?)
+           OR (status = 'running' AND locked_until < ?)
+        ORDER BY created_at
+        LIMIT 1
+    ''', (now, now))
+    job = cursor.fetchone()
+    if job:
+        cursor.execute('''
+            UPDATE summary_jobs
+            SET status = 'running', attempts = attempts + 1, locked_until = ?, updated_at = ?
+            WHERE bill_id = ?
+        ''', (now + lease_seconds, now, job[0]))
+    return job
+
+def complete_job(cursor, bill_id):
+    cursor.execute(
+        "UPDATE summary_jobs SET status = 'done', last_error = NULL, locked_until = NULL, updated_at = ? WHERE bill_id = ?",
+        (time.time(), bill_id)
+    )
+
+def fail_job(cursor, bill_id, error):
+    """Put the job back in the queue with a delay, or give up after MAX_ATTEMPTS."""
+    now = time.time()
+    cursor.execute('''
+        UPDATE summary_jobs
+        SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+            available_at = ? + attempts * ?,
+            last_error = ?,
+            locked_until = NULL,
+            updated_at = ?
+        WHERE bill_id = ?
+    ''', (MAX_ATTEMPTS, now, RETRY_DELAY_SECONDS, str(error)[:1000], now, bill_id))
+
+# ----------------------------
+# 👷 Workers
+# ----------------------------
+def work(stop_event, poll_interval=POLL_INTERVAL_SECONDS):
+    """One worker thread: claim, summarize, repeat until stop_event is set."""
+    from summarize import summarize_and_store_bill
+
+    while not stop_event.is_set():
+        job = db.write(claim_job)
+        if not job:
+            stop_event.wait(poll_interval)
+            continue
+
+        bill_id, vote_text, outcome, topic = job
+        start = time.perf_counter()
+        try:
+            summarize_and_store_bill(bill_id=bill_id, vote_text=vote_text, outcome=outcome, topic=topic)
+        except Exception as e:
+            logging.error(f"❌ Summary job for bill {bill_id} failed: {e}")
+            db.write(fail_job, bill_id, e)
+        else:
+            db.write(complete_job, bill_id)
+            logging.info(f"📝 Summary job for bill {bill_id} finished in {time.perf_counter() - start:.1f}s")
+
+def run_workers(num_workers=NUM_WORKERS):
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=work, args=(stop_event,), daemon=True) for _ in range(num_workers)]
+    for thread in threads:
+        thread.start()
+    print(f"👷 {num_workers} summary workers running. Ctrl+C to stop.")
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping summary workers...")
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        filename="ai_summarization.log",
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(description="Run background workers that generate bill summaries.")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    args = parser.parse_args()
+    run_workers(args.workers)
@@ -1,4 +1,6 @@
-from app import get_legislation_for_rep
+import db
+from app import find_people, get_legislation_for_reps
 
-results = get_legislation_for_rep("M001243") ## Example bioguide_id
+cursor = db.reader().cursor()
+results = get_legislation_for_reps(cursor, find_people(cursor, ["M001243"]))  ## Example bioguide_id
 print(results)
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import tempfile
+
+# config.py reads these at import time, so point everything at a scratch directory first
+DATA_DIR = tempfile.mkdtemp(prefix="snapshot-test-")
+os.environ.update({
+    "DATA_DIR": DATA_DIR,
+    "DB_FILE": os.path.join(DATA_DIR, "legislation.db"),
+    "SNAPSHOT_DIR": os.path.join(DATA_DIR, "snapshots"),
+    "OVERLAY_DB_FILE": os.path.join(DATA_DIR, "overlay.db"),
+    "USE_SNAPSHOT": "1",
+})
+
+import db
+import snapshot
+from bill_topics import store_bill_topics
+from initialize_database import initialize_db
+
+def snapshot_topics(path, bill_id):
+    conn = db.open_snapshot(path)
+    try:
+        topic = conn.execute("SELECT topic FROM bills WHERE bill_id = ?", (bill_id,)).fetchone()[0]
+        rows = conn.execute("SELECT topic FROM bill_topics WHERE bill_id = ? ORDER BY topic", (bill_id,)).fetchall()
+        return topic, [row[0] for row in rows]
+    finally:
+        conn.close()
+
+def reader_topics(bill_id):
+    db.snapshot_checked_at = 0.0   # pick up a snapshot published a moment ago
+    cursor = db.reader().cursor()
+    topic = cursor.execute("SELECT topic FROM bills WHERE bill_id = ?", (bill_id,)).fetchone()[0]
+    rows = cursor.execute("SELECT topic FROM bill_topics WHERE bill_id = ? ORDER BY topic", (bill_id,)).fetchall()
+    return topic, [row[0] for row in rows]
+
+def setup_module():
+    initialize_db()
+    conn = sqlite3.connect(os.environ["DB_FILE"])
+    conn.executemany(
+        "INSERT INTO bills (bill_id, status, status_date, title, topic, topic_scores) VALUES (?, 4, ?, ?, ?, ?)",
+        [
+            (1, "2024-01-02", "Bill 1", "Healthcare", '{"Healthcare": 0.9}'),
+            (2, "2024-01-01", "Bill 2", "Taxes", '{"Taxes": 0.8}'),
+        ]
+    )
+    conn.executemany("INSERT INTO bill_topics (bill_id, topic, score) VALUES (?, ?, ?)",
+                     [(1, "Healthcare", 0.9), (2, "Taxes", 0.8)])
+    conn.commit()
+    conn.close()
+    snapshot.publish()
+
+def test_reader_maps_the_snapshot():
+    conn = db.reader()
+    # SQLite caps the request at its compile-time limit; it must not fall back to the overlay's size
+    assert conn.execute("PRAGMA snapshot.mmap_size").fetchone()[0] > db.MMAP_SIZE
+    assert conn.execute("PRAGMA main.mmap_size").fetchone()[0] == db.MMAP_SIZE
+
+def test_summary_update_keeps_topics_through_publish():
+    db.execute("UPDATE bills SET summary = ? WHERE bill_id = ?", ("A new summary", 1))
+    assert reader_topics(1) == ("Healthcare", ["Healthcare"])
+
+    path = snapshot.publish()
+    assert snapshot_topics(path, 1) == ("Healthcare", ["Healthcare"])
+    assert reader_topics(1) == ("Healthcare", ["Healthcare"])
+    assert db.reader().execute("SELECT summary FROM bills WHERE bill_id = 1").fetchone()[0] == "A new summary"
+
+def test_reclassification_replaces_topics_through_publish():
+    db.write(store_bill_topics, [("Energy, Taxes", '{"Energy": 0.9, "Taxes": 0.7}', 2)])
+    assert reader_topics(2) == ("Energy, Taxes", ["Energy", "Taxes"])
+
+    # Writing the same topics again must not duplicate the rows
+    db.write(store_bill_topics, [("Energy, Taxes", '{"Energy": 0.9, "Taxes": 0.7}', 2)])
+    assert reader_topics(2) == ("Energy, Taxes", ["Energy", "Taxes"])
+
+    path = snapshot.publish()
+    assert snapshot_topics(path, 2) == ("Energy, Taxes", ["Energy", "Taxes"])
+    assert reader_topics(2) == ("Energy, Taxes", ["Energy", "Taxes"])
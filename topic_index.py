@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+import db
+from bill_topics import data_version
+
+# ----------------------------
+# 🧮 In-memory topic bitmap index
+# ----------------------------
+# Bills are numbered by rank (0 = most recent status_date) and every topic keeps
+# a bitmap of the ranks that carry it, stored as a Python int. An "any" search
+# ORs the topics' bitmaps and an "all" search ANDs them. Matches are read
+# lowest-rank first and reading stops at the limit, so the newest N matches
+# come back without touching SQLite.
+TOPIC_INDEX_SNAPSHOT = os.getenv("TOPIC_INDEX_SNAPSHOT", "topic_index.json")
+REFRESH_CHECK_SECONDS = 5      # how often searches check data_versions for new topics
+
+class TopicIndex:
+    def __init__(self, version, order, bitmaps):
+        self.version = version
+        self.order = order          # rank -> bill_id
+        self.bitmaps = bitmaps      # topic -> int with bit `rank` set for each bill that has the topic
+
+    @classmethod
+    def build(cls, conn):
+        cursor = conn.cursor()
+        version = data_version(cursor)
+        cursor.execute("SELECT bill_id FROM bills ORDER BY status_date DESC, bill_id DESC")
+        order = [row[0] for row in cursor.fetchall()]
+        rank = {bill_id: i for i, bill_id in enumerate(order)}
+
+        # Set bits in bytearrays and convert once; OR-ing into a growing int would be quadratic
+        bits = {}
+        cursor.execute("SELECT topic, bill_id FROM bill_topics")
+        for topic, bill_id in cursor:
+            i = rank.get(bill_id)
+            if i is None:
+                continue
+            buffer = bits.get(topic)
+            if buffer is None:
+                buffer = bits[topic] = bytearray((len(order) + 7) // 8)
+            buffer[i >> 3] |= 1 << (i & 7)
+
+        bitmaps = {topic: int.from_bytes(buffer, "little") for topic, buffer in bits.items()}
+        return cls(version, order, bitmaps)
+
+    def search(self, topics, match_behavior="any", limit=10):
+        """bill_ids carrying any/all of the topics, newest status_date first, at most `limit`."""
+        topics = list(dict.fromkeys(topic.strip() for topic in topics))
+        if not topics:
+            return []
+        maps = [self.bitmaps.get(topic, 0) for topic in topics]
+
+        matches = maps[0]
+        for bitmap in maps[1:]:
+            if match_behavior == "all":
+                matches &= bitmap
+                if not matches:
+                    return []
+            else:
+                matches |= bitmap
+
+        bill_ids = []
+        while matches and len(bill_ids) < limit:
+            lowest = matches & -matches
+            bill_ids.append(self.order[lowest.bit_length() - 1])
+            matches ^= lowest
+        return bill_ids
+
+    def save(self, path=TOPIC_INDEX_SNAPSHOT):
+        """Write a snapshot that load() can use instead of rebuilding from SQLite."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": self.version,
+                "order": self.order,
+                "bitmaps": {topic: format(bitmap, "x") for topic, bitmap in self.bitmaps.items()},
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=TOPIC_INDEX_SNAPSHOT):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["version"], data["order"], {topic: int(h, 16) for topic, h in data["bitmaps"].items()})
+
+class LiveTopicIndex:
+    """A TopicIndex that rebuilds itself when data_versions says topics changed.
+
+    Starts from the snapshot file when it matches the database's current
+    version, otherwise builds from SQLite. Searches swap in a rebuilt index at
+    most every REFRESH_CHECK_SECONDS.
+    """
+
+    def __init__(self, snapshot_path=TOPIC_INDEX_SNAPSHOT):
+        self.lock = threading.Lock()
+        self.checked_at = time.monotonic()
+        conn = db.reader()
+        current = data_version(conn.cursor())
+        self.index = None
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                snapshot = TopicIndex.load(snapshot_path)
+                if snapshot.version == current:
+                    self.index = snapshot
+                    logging.info(f"🧮 Topic index loaded from {snapshot_path} (version {current}).")
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"⚠️ Ignoring unreadable topic index snapshot {snapshot_path}: {e}")
+        if self.index is None:
+            self.index = self.timed_build(conn)
+
+    def timed_build(self, conn):
+        start = time.perf_counter()
+        index = TopicIndex.build(conn)
+        logging.info(
+            f"🧮 Topic index built: {len(index.order):,} bills, {len(index.bitmaps)} topics, "
+            f"version {index.version}, {time.perf_counter() - start:.2f}s"
+        )
+        return index
+
+    def refresh_if_stale(self):
+        if time.monotonic() - self.checked_at < REFRESH_CHECK_SECONDS:
+            return
+        # One thread checks and rebuilds; the others keep searching the current index
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.checked_at = time.monotonic()
+            conn = db.reader()
+            if data_version(conn.cursor()) != self.index.version:
+                self.index = self.timed_build(conn)
+        finally:
+            self.lock.release()
+
+    def search(self, topics, match_behavior="any", limit=10):
+        self.refresh_if_stale()
+        return self.index.search(topics, match_behavior, limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the topic index and write a snapshot for fast app startup.")
+    parser.add_argument("--output", default=TOPIC_INDEX_SNAPSHOT)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = TopicIndex.build(db.reader())
+    index.save(args.output)
+    print(f"🧮 Topic index for {len(index.order):,} bills ({len(index.bitmaps)} topics, version {index.version}) "
+          f"written to {args.output} in {time.perf_counter() - start:.2f}s")